@@ -1,58 +1,355 @@
 # database.py - Complete fix aligned with actual Supabase schema
 
 import os
+import asyncio
+import functools
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+import orjson
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from supabase import create_client, Client
+from supabase.lib.client_options import ClientOptions
+import numpy as np
 import pandas as pd
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, List, Optional, Any, Set, Tuple
 from dotenv import load_dotenv
-from datetime import datetime
-import traceback
+import time
+import types
+import logging
 
 # Load environment variables
 load_dotenv()
 
+log = logging.getLogger(__name__)
+
 # Supabase connection
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY")
 SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
 
-# Create Supabase client
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
-supabase_admin: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY) if SUPABASE_SERVICE_KEY else supabase
+def _use_orjson_for_postgrest() -> None:
+    """Route httpx's JSON encode/decode (used by postgrest for every request body and
+    response) through orjson. No-op if the httpx internals are not where we expect."""
+    try:
+        import httpx._content as httpx_content
+        import httpx._models as httpx_models
+    except ImportError:
+        return
+
+    def dumps(obj, **_kwargs) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+
+    def loads(data, **_kwargs):
+        return orjson.loads(data)
+
+    if hasattr(httpx_content, 'json_dumps'):
+        httpx_content.json_dumps = dumps
+    if hasattr(httpx_models, 'jsonlib'):
+        # Stands in for the json module httpx imported as jsonlib - only loads/dumps are used
+        httpx_models.jsonlib = types.SimpleNamespace(loads=loads, dumps=dumps)
+
+_use_orjson_for_postgrest()
+
+# PostgREST request timeout - bulk upserts can take longer than the httpx default
+POSTGREST_TIMEOUT = int(os.getenv("POSTGREST_TIMEOUT", "30"))
+
+# Connection pool for each PostgREST session - sized for concurrent upsert batches plus API reads
+POSTGREST_LIMITS = httpx.Limits(
+    max_connections=int(os.getenv("POSTGREST_MAX_CONNECTIONS", "64")),
+    max_keepalive_connections=int(os.getenv("POSTGREST_MAX_KEEPALIVE", "32")),
+    keepalive_expiry=30
+)
+# How long a query waits for a free pooled connection before failing - a saturated pool
+# shows up as a fast PoolTimeout instead of requests queueing for the full POSTGREST_TIMEOUT
+POSTGREST_POOL_TIMEOUT = float(os.getenv("POSTGREST_POOL_TIMEOUT", "2"))
+# Multiplex concurrent PostgREST requests over one TLS connection when the h2 package is installed
+POSTGREST_HTTP2 = os.getenv("POSTGREST_HTTP2", "1") != "0"
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401 - provided by httpx[http2]
+        return True
+    except ImportError:
+        return False
+
+def _client_options() -> ClientOptions:
+    # Each client keeps one long-lived PostgREST session, so TCP/TLS is reused between queries.
+    # postgrest sets base_url/auth headers on the httpx client it is given, so never share one.
+    options = dict(postgrest_client_timeout=POSTGREST_TIMEOUT, schema='public')
+    try:
+        return ClientOptions(
+            httpx_client=httpx.Client(
+                limits=POSTGREST_LIMITS,
+                timeout=httpx.Timeout(POSTGREST_TIMEOUT, pool=POSTGREST_POOL_TIMEOUT),
+                http2=POSTGREST_HTTP2 and _http2_available()
+            ),
+            **options
+        )
+    except TypeError:
+        # supabase-py releases without the httpx_client option keep httpx's default pool
+        return ClientOptions(**options)
+
+@functools.lru_cache(maxsize=1)
+def _clients() -> Tuple[Client, Client]:
+    """Create the (anon, admin) Supabase clients on first use rather than at import"""
+    client = create_client(SUPABASE_URL, SUPABASE_ANON_KEY, options=_client_options())
+    admin_client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY, options=_client_options()) \
+        if SUPABASE_SERVICE_KEY else client
+    return client, admin_client
+
+# Rows per upsert request - large single bodies degrade PostgREST latency and memory
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "500"))
+# Upsert batches in flight at once - returns diminish past a handful of concurrent requests
+UPSERT_CONCURRENCY = int(os.getenv("UPSERT_CONCURRENCY", "4"))
+
+# Optional direct Postgres connection for COPY-based bulk loads (bypasses PostgREST)
+SUPABASE_DB_URL = os.getenv("SUPABASE_DB_URL")
+COPY_MIN_ROWS = int(os.getenv("COPY_MIN_ROWS", "500"))  # smaller loads are cheaper over PostgREST
+# asyncpg pool on the same URL for read aggregates that return one row (binary protocol, no PostgREST hop).
+# Created on first use inside the server's event loop
+PG_POOL_MAX_SIZE = int(os.getenv("PG_POOL_MAX_SIZE", "10"))
+_pg_pool = None
+_pg_pool_lock = asyncio.Lock()
+
+# The current gameweek changes at most weekly, so keep it in-process for a while
+GAMEWEEK_CACHE_TTL = 600  # seconds
+_gw_cache = {'value': None, 'ts': 0.0}
+
+# Liveness probes hit / and /health every few seconds - one real round trip per window is enough
+HEALTH_CACHE_TTL = 30  # seconds
+_health_cache = {'value': None, 'ts': 0.0}
+
+# Optional Redis cache for slow-changing lookups (league memberships, player names)
+REDIS_URL = os.getenv("REDIS_URL")
+LOOKUP_CACHE_TTL = 300  # seconds
+
+def _create_redis():
+    if not REDIS_URL:
+        return None
+    try:
+        import redis
+        return redis.Redis.from_url(REDIS_URL)
+    except Exception as e:
+        log.warning("Redis cache disabled: %s", e)
+        return None
+
+_redis = _create_redis()
+
+def _redis_delete_prefix(prefix: str) -> None:
+    """Delete every Redis key starting with prefix (no-op without Redis; failures only log)"""
+    if _redis is not None:
+        try:
+            keys = list(_redis.scan_iter(match=f'{prefix}*', count=500))
+            if keys:
+                _redis.delete(*keys)
+        except Exception as e:
+            log.warning("Redis invalidation failed for %s: %s", prefix, e)
+
+# Keep-alive session for FPL API calls made from this module - one TLS handshake per pooled connection
+_fpl_session = requests.Session()
+_fpl_session.mount('https://', HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=8,
+    # Retry transient FPL API failures inside the pooled connection instead of with a fresh request
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=frozenset(['GET']))
+))
+
+# Raw bootstrap-static body (~500 KB) shared on disk by worker processes and across restarts
+BOOTSTRAP_CACHE_PATH = os.getenv("FPL_BOOTSTRAP_CACHE", "/tmp/fpl_bootstrap.json")
+
+def _bootstrap_static() -> Dict[str, Any]:
+    """bootstrap-static payload, re-downloaded only when the disk copy is older than GAMEWEEK_CACHE_TTL"""
+    try:
+        if time.time() - os.path.getmtime(BOOTSTRAP_CACHE_PATH) < GAMEWEEK_CACHE_TTL:
+            with open(BOOTSTRAP_CACHE_PATH, 'rb') as f:
+                return orjson.loads(f.read())
+    except (OSError, orjson.JSONDecodeError):
+        pass  # missing, unreadable or half-written copy - refetch
+    
+    response = _fpl_session.get('https://fantasy.premierleague.com/api/bootstrap-static/', timeout=10)
+    response.raise_for_status()
+    data = orjson.loads(response.content)
+    
+    try:
+        # Write then rename so concurrent readers never see a partial file
+        tmp_path = f"{BOOTSTRAP_CACHE_PATH}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(response.content)
+        os.replace(tmp_path, BOOTSTRAP_CACHE_PATH)
+    except OSError as e:
+        log.warning("Could not cache bootstrap-static at %s: %s", BOOTSTRAP_CACHE_PATH, e)
+    return data
+
+# Columns the standings response actually reads (fpl_service._format_league_standings)
+# league_position is the view's rank over the whole league, so paginated pages keep their true positions
+STANDINGS_COLUMNS = ('league_position, entry_id, player_name, team_name, total_points, gameweek_points, transfers, '
+                     'transfers_cost, captain_name, vice_captain_name, active_chip, points_on_bench')
+# Same shape from the base table - PostgREST aliases points as gameweek_points
+STANDINGS_FALLBACK_COLUMNS = ('entry_id, total_points, gameweek_points:points, transfers, transfers_cost, '
+                              'captain_name, vice_captain_name, active_chip, points_on_bench')
+
+# chip_usage_new unique key - a chip can be played more than once a season, so the gameweek is part of it
+CHIP_USAGE_KEY = 'league_id,entry_id,chip_name,gameweek_used'
+
+# Nullable ints so a missing value stays <NA> instead of turning the column into floats
+STANDINGS_DTYPES = {column: 'Int64' for column in (
+    'league_position', 'entry_id', 'total_points', 'gameweek_points', 'transfers', 'transfers_cost',
+    'points_on_bench'
+)}
+
+def _result_columns(select: str) -> List[str]:
+    """Keys PostgREST returns for a flat select string - 'alias:column' comes back as alias"""
+    return [part.split(':')[0].strip() for part in select.split(',')]
+
+def _records_frame(rows: List[Dict[str, Any]], select: str,
+                   dtypes: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+    """Build a frame with a known column order (no key-union pass) and optionally fixed dtypes"""
+    df = pd.DataFrame.from_records(rows, columns=_result_columns(select))
+    return df.astype(dtypes, copy=False) if dtypes else df
+
+# captain_analysis_view projection
+CAPTAIN_COLUMNS = ('captain_id, captain_name, times_captained, total_points, average_points, '
+                   'best_performance, worst_performance')
+
+# Per-manager gameweek rows for the captain analysis response
+MANAGER_ROW_COLUMNS = ('entry_id, gameweek, gameweek_points, total_points, captain_name, vice_captain_name, '
+                       'active_chip, transfers_cost, team_value, points_on_bench, player_name, team_name')
+
+# Columns /player/{entry_id}/history reads, aliased to the names it expects
+PLAYER_HISTORY_COLUMNS = ('gameweek, points, total_points, captain:captain_name, vice_captain:vice_captain_name, '
+                          'transfers_cost, team_value, active_chip')
+
+# Chosen standings gameweek per (league_id, current_gw)
+SMART_GAMEWEEK_CACHE_TTL = 60  # seconds
+_smart_gw_cache: Dict[Tuple[int, int], Tuple[float, int, int]] = {}
+
+# League rows (id, name, updated_at) - only rewritten by store_league_info
+LEAGUE_CACHE_TTL = 60  # seconds
+_league_cache: Dict[int, Tuple[float, Optional[Dict[str, Any]]]] = {}
+
+# Content hashes of recent full writes, so unchanged rosters are not re-uploaded every run.
+# Entries expire so last_updated/last_active are still refreshed now and then.
+WRITE_ELISION_TTL = int(os.getenv("WRITE_ELISION_TTL", "3600"))  # seconds
+_written_hashes: Dict[Tuple[str, str], Tuple[float, str]] = {}
+
+def _content_hash(df: pd.DataFrame) -> str:
+    return hashlib.sha1(pd.util.hash_pandas_object(df, index=False).values.tobytes()).hexdigest()
+
+def _recently_written(key: Tuple[str, str], content: str) -> bool:
+    written = _written_hashes.get(key)
+    return bool(written) and written[1] == content and time.time() - written[0] < WRITE_ELISION_TTL
+
+def _remember_write(key: Tuple[str, str], content: str) -> None:
+    _written_hashes[key] = (time.time(), content)
+
+# Standings / cross-league frames, which change at most once per collection run
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", "300"))  # seconds
+RESULT_CACHE_MAX_ENTRIES = 256
+_result_cache: Dict[Tuple, Tuple[float, int, pd.DataFrame]] = {}
+
+# Data generation per league (and one for cross-league reads), bumped whenever new data is written.
+# Cached frames/responses remember the generation they were built at and are ignored once it moves on.
+# With REDIS_URL the counters live in Redis, so an ingest on one worker retires every worker's copies
+CROSS_LEAGUE_SCOPE = 'cross_league'
+_local_generations: Dict[Any, int] = {}
+
+def _data_generation(scope: Any) -> int:
+    if _redis is not None:
+        try:
+            return int(_redis.get(f'gen:{scope}') or 0)
+        except Exception as e:
+            log.warning("Redis generation read failed for %s: %s", scope, e)
+    return _local_generations.get(scope, 0)
+
+def _bump_generations(scopes: Set[Any]) -> None:
+    for scope in scopes:
+        _local_generations[scope] = _local_generations.get(scope, 0) + 1
+        if _redis is not None:
+            try:
+                _redis.incr(f'gen:{scope}')
+            except Exception as e:
+                log.warning("Redis generation bump failed for %s: %s", scope, e)
+
+def _result_scope(key: Tuple) -> Any:
+    return CROSS_LEAGUE_SCOPE if key[0] == 'cross_league' else key[1]
+
+def _cached_result(key: Tuple) -> Optional[pd.DataFrame]:
+    cached = _result_cache.get(key)
+    if cached and time.time() - cached[0] < RESULT_CACHE_TTL and cached[1] == _data_generation(_result_scope(key)):
+        return cached[2]
+    return None
+
+def _store_result(key: Tuple, df: pd.DataFrame) -> pd.DataFrame:
+    if not df.empty:
+        if len(_result_cache) >= RESULT_CACHE_MAX_ENTRIES:
+            _result_cache.pop(next(iter(_result_cache)))  # evict the oldest insert
+        _result_cache[key] = (time.time(), _data_generation(_result_scope(key)), df)
+    return df
 
 class FPLDatabase:
-    def __init__(self):
-        self.client = supabase
-        self.admin_client = supabase_admin
+    # Clients are resolved lazily so importing this module does no network/client setup
+    @property
+    def client(self) -> Client:
+        return _clients()[0]
+
+    @property
+    def admin_client(self) -> Client:
+        return _clients()[1]
+
+    def _bulk_upsert(self, table: str, rows: List[Dict[str, Any]], on_conflict: str,
+                     batch_size: int = UPSERT_BATCH_SIZE) -> int:
+        """
+        Upsert rows in batch_size slices, up to UPSERT_CONCURRENCY batches in flight,
+        and return the number of rows sent (raises if any batch fails).
+        Batches are sent with returning=minimal so PostgREST doesn't echo the rows back.
+        """
+        batches = [rows[i:i + batch_size] for i in range(0, len(rows), batch_size)]
+        client = self.client  # resolve once - the underlying httpx client is shared by the worker threads
+        
+        def upsert_batch(batch: List[Dict[str, Any]]) -> int:
+            client.table(table).upsert(batch, on_conflict=on_conflict, returning='minimal').execute()
+            return len(batch)
+        
+        if len(batches) <= 1 or UPSERT_CONCURRENCY <= 1:
+            results = [upsert_batch(batch) for batch in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=min(UPSERT_CONCURRENCY, len(batches))) as pool:
+                results = list(pool.map(upsert_batch, batches))
+        
+        return sum(results)
+
+    def get_bootstrap_static(self) -> Dict[str, Any]:
+        """Raw bootstrap-static payload from the shared disk copy (re-downloaded after GAMEWEEK_CACHE_TTL)"""
+        return _bootstrap_static()
 
     def get_current_gameweek(self) -> Optional[int]:
-        """Fetches current gameweek from FPL API with better error handling"""
+        """Fetches current gameweek from FPL API (cached for GAMEWEEK_CACHE_TTL seconds)"""
+        if _gw_cache['value'] is not None and time.time() - _gw_cache['ts'] < GAMEWEEK_CACHE_TTL:
+            return _gw_cache['value']
+        
         try:
-            import requests
-            import json
-            from pandas import json_normalize
-            
-            response = requests.get(
-                'https://fantasy.premierleague.com/api/bootstrap-static/', 
-                verify=False,
-                timeout=10
-            )
-            response.raise_for_status()
+            fpl_data = _bootstrap_static()
+            current_gw = next((int(ev['id']) for ev in fpl_data['events'] if ev.get('is_current')), None)
             
-            fpl_data = json.loads(response.text)
-            events_df = json_normalize(fpl_data['events'])
-            
-            for i, is_current in enumerate(events_df['is_current']):
-                if is_current:
-                    current_gw = int(events_df['id'].iloc[i])
-                    print(f"Current gameweek identified: {current_gw}")
-                    return current_gw
+            if current_gw is not None:
+                log.info("Current gameweek identified: %s", current_gw)
+                _gw_cache['value'] = current_gw
+                _gw_cache['ts'] = time.time()
+                return current_gw
             
-            print("Warning: No current gameweek found in API response")
+            log.warning("No current gameweek found in API response")
             return 1  # Default fallback
             
         except Exception as e:
-            print(f"Error fetching current gameweek: {e}")
+            if _gw_cache['value'] is not None:
+                # A stale gameweek is a better answer than the hardcoded default
+                log.warning("Error fetching current gameweek, using cached %s: %s", _gw_cache['value'], e)
+                return _gw_cache['value']
+            log.error("Error fetching current gameweek: %s", e)
             return 1  # Default fallback
 
     def update_current_gameweek(self) -> bool:
@@ -60,13 +357,13 @@ class FPLDatabase:
         try:
             current_gw = self.get_current_gameweek()
             if current_gw is not None:
-                print(f"Current gameweek updated to: {current_gw}")
+                log.info("Current gameweek updated to: %s", current_gw)
                 return True
             else:
-                print("Failed to update current gameweek")
+                log.warning("Failed to update current gameweek")
                 return False
         except Exception as e:
-            print(f"Error updating current gameweek: {e}")
+            log.error("Error updating current gameweek: %s", e)
             return False
 
     def store_league_info(self, league_id: int, league_name: str) -> bool:
@@ -74,514 +371,842 @@ class FPLDatabase:
         try:
             league_record = {
                 'id': league_id,
-                'name': league_name,
-                'updated_at': datetime.now().isoformat()  # leagues table has updated_at
+                'name': league_name
+                # updated_at is stamped by the leagues_touch trigger
             }
             
-            result = self.client.table('leagues').upsert(
+            self.client.table('leagues').upsert(
                 league_record,
-                on_conflict='id'
+                on_conflict='id',
+                returning='minimal'
             ).execute()
+            _league_cache.pop(league_id, None)
             
-            return len(result.data) > 0
+            return True
             
         except Exception as e:
-            print(f"Error storing league info: {e}")
-            traceback.print_exc()
+            log.exception("Error storing league info: %s", e)
             return False
 
     def store_global_players(self, players_df: pd.DataFrame) -> bool:
         """Store players in global_players table - SCHEMA ALIGNED"""
         try:
             if players_df.empty:
-                print("No players data to store")
+                log.info("No players data to store")
                 return True
 
-            print(f"Attempting to store {len(players_df)} global players...")
-            
-            players_data = []
-            current_time = datetime.now().isoformat()
+            log.info("Attempting to store %d global players...", len(players_df))
+            
+            # Plain column renames - coerce whole columns, then materialise records once
+            # (last_updated is stamped by trigger; first_seen by DEFAULT now() on first insert)
+            players_frame = players_df[['entry', 'player_name', 'entry_name']]\
+                .astype({'entry': int, 'player_name': str, 'entry_name': str})\
+                .rename(columns={'entry': 'entry_id', 'entry_name': 'current_team_name'})
+            
+            # Rosters rarely change mid-season - skip the round trip when this exact set was just written
+            write_key = ('global_players', _content_hash(players_frame[['entry_id']]))
+            content = _content_hash(players_frame)
+            if _recently_written(write_key, content):
+                log.info("Global players unchanged since last write, skipping upsert")
+                return True
             
-            for _, player in players_df.iterrows():
-                player_record = {
-                    'entry_id': int(player['entry']),
-                    'player_name': str(player['player_name']),
-                    'current_team_name': str(player['entry_name']),
-                    'last_updated': current_time  # Note: global_players uses 'last_updated', not 'updated_at'
-                    # first_seen will be set by DEFAULT now() on first insert
-                }
-                players_data.append(player_record)
+            players_data = players_frame.to_dict('records')
             
             if not players_data:
-                print("No valid player records to store")
+                log.warning("No valid player records to store")
                 return False
 
-            print(f"Sample record: {players_data[0]}")
+            log.debug("Sample record: %s", players_data[0])
             
             # Try bulk upsert first
             try:
-                result = self.client.table('global_players').upsert(
-                    players_data,
-                    on_conflict='entry_id'
-                ).execute()
+                stored = self._bulk_upsert('global_players', players_data, on_conflict='entry_id')
                 
-                print(f"Successfully stored {len(result.data)} global players via bulk upsert")
+                log.info("Successfully stored %d global players via bulk upsert", stored)
+                _remember_write(write_key, content)
+                self._invalidate_player_name_cache()
                 return True
                 
             except Exception as bulk_error:
-                print(f"Bulk upsert failed: {bulk_error}")
+                log.warning("Bulk upsert failed: %s", bulk_error)
                 
                 # Fallback to individual upserts
-                return self._store_players_individually(players_data)
+                stored = self._store_players_individually(players_data)
+                if stored:
+                    self._invalidate_player_name_cache()
+                return stored
                 
         except Exception as e:
-            print(f"Error in store_global_players: {e}")
-            traceback.print_exc()
+            log.exception("Error in store_global_players: %s", e)
             return False
 
+    def _chunked_upsert(self, table: str, rows: List[Dict[str, Any]], on_conflict: str,
+                        chunk_size: int = UPSERT_BATCH_SIZE) -> int:
+        """Upsert rows chunk by chunk, skipping failed chunks; returns how many rows were stored"""
+        success_count = 0
+        errors = []
+        
+        for i in range(0, len(rows), chunk_size):
+            chunk = rows[i:i + chunk_size]
+            try:
+                # PostgREST resolves the conflict server-side (merge-duplicates)
+                self.client.table(table).upsert(chunk, on_conflict=on_conflict, returning='minimal').execute()
+                success_count += len(chunk)
+                log.debug("Progress: %d/%d %s rows processed", i + len(chunk), len(rows), table)
+            except Exception as chunk_error:
+                # Collected and reported once below rather than logged per failing chunk
+                errors.append(f"rows {i + 1}-{i + len(chunk)}: {chunk_error}")
+        
+        log.info("Chunked upserts: %d/%d %s rows stored", success_count, len(rows), table)
+        if errors:
+            log.warning("%d %s chunks failed; first errors: %s", len(errors), table, '; '.join(errors[:3]))
+        return success_count
+
     def _store_players_individually(self, players_data: List[Dict[str, Any]]) -> bool:
-        """Fallback method to store players individually"""
-        try:
-            print("Trying individual player upserts...")
-            success_count = 0
-            errors = []
-            
-            for i, player_record in enumerate(players_data):
-                try:
-                    # Try insert first, then update if exists
-                    try:
-                        result = self.client.table('global_players').insert(player_record).execute()
-                        success_count += 1
-                    except Exception as insert_error:
-                        if "duplicate key value violates unique constraint" in str(insert_error).lower():
-                            # Player exists, try update
-                            update_record = {k: v for k, v in player_record.items() if k != 'entry_id'}
-                            result = self.client.table('global_players')\
-                                .update(update_record)\
-                                .eq('entry_id', player_record['entry_id'])\
-                                .execute()
-                            success_count += 1
-                        else:
-                            raise insert_error
-                    
-                    # Progress indicator
-                    if (i + 1) % 5 == 0:
-                        print(f"Progress: {i + 1}/{len(players_data)} players processed")
-                        
-                except Exception as player_error:
-                    error_msg = f"Player {player_record.get('entry_id')}: {player_error}"
-                    errors.append(error_msg)
-                    print(f"Failed to store {error_msg}")
-                    continue
-            
-            print(f"Individual inserts: {success_count}/{len(players_data)} players stored")
-            
-            if errors and len(errors) <= 3:
-                print("Sample errors:")
-                for error in errors[:3]:
-                    print(f"  - {error}")
-            
-            return success_count > 0
-            
-        except Exception as e:
-            print(f"Individual inserts also failed: {e}")
-            return False
+        """Fallback method to store players in fixed-size upsert batches"""
+        log.info("Trying batched player upserts (%d per batch)...", UPSERT_BATCH_SIZE)
+        return self._chunked_upsert('global_players', players_data, on_conflict='entry_id') > 0
 
     def store_league_memberships(self, league_id: int, players_df: pd.DataFrame) -> bool:
         """Store league memberships - SCHEMA ALIGNED"""
         try:
             if players_df.empty:
-                print("No membership data to store")
+                log.info("No membership data to store")
                 return True
 
-            memberships_data = []
-            current_time = datetime.now().isoformat()
+            # (last_active is stamped by trigger; joined_at by DEFAULT now() on first insert)
+            memberships_frame = players_df[['entry', 'entry_name']]\
+                .astype({'entry': int, 'entry_name': str})\
+                .rename(columns={'entry': 'entry_id', 'entry_name': 'team_name'})\
+                .assign(league_id=int(league_id))[['league_id', 'entry_id', 'team_name']]
+            
+            write_key = ('league_memberships', str(league_id))
+            content = _content_hash(memberships_frame)
+            if _recently_written(write_key, content):
+                log.info("Memberships for league %s unchanged since last write, skipping upsert", league_id)
+                return True
             
-            for _, player in players_df.iterrows():
-                membership_record = {
-                    'league_id': int(league_id),
-                    'entry_id': int(player['entry']),
-                    'team_name': str(player['entry_name']),
-                    'last_active': current_time  # Note: league_memberships uses 'last_active', not 'updated_at'
-                    # joined_at will be set by DEFAULT now() on first insert
-                }
-                memberships_data.append(membership_record)
+            memberships_data = memberships_frame.to_dict('records')
             
-            print(f"Attempting to store {len(memberships_data)} league memberships...")
-            print(f"Sample membership: {memberships_data[0] if memberships_data else 'No data'}")
+            log.info("Attempting to store %d league memberships...", len(memberships_data))
+            log.debug("Sample membership: %s", memberships_data[0] if memberships_data else 'No data')
             
             # Try bulk upsert
             try:
-                result = self.client.table('league_memberships').upsert(
+                stored = self._bulk_upsert(
+                    'league_memberships',
                     memberships_data,
                     on_conflict='league_id,entry_id'  # This matches the unique constraint
-                ).execute()
+                )
                 
-                print(f"Successfully stored {len(result.data)} league memberships via bulk upsert")
+                log.info("Successfully stored %d league memberships via bulk upsert", stored)
+                self._invalidate_lookup_cache(league_id)
+                _remember_write(write_key, content)
                 return True
                 
             except Exception as bulk_error:
-                print(f"Bulk membership upsert failed: {bulk_error}")
+                log.warning("Bulk membership upsert failed: %s", bulk_error)
                 
-                # Check if it's just a "already exists" error
-                if "duplicate key value violates unique constraint" in str(bulk_error).lower():
-                    print("Memberships already exist, trying individual updates...")
-                    return self._store_memberships_individually(memberships_data)
-                else:
-                    print(f"Other error: {bulk_error}")
-                    return False
+                # Upsert already resolves conflicts, so retry per batch and keep whatever succeeds
+                stored = self._store_memberships_individually(memberships_data)
+                if stored:
+                    self._invalidate_lookup_cache(league_id)
+                return stored
                 
         except Exception as e:
-            print(f"Error in store_league_memberships: {e}")
-            traceback.print_exc()
+            log.exception("Error in store_league_memberships: %s", e)
             return False
 
     def _store_memberships_individually(self, memberships_data: List[Dict[str, Any]]) -> bool:
-        """Fallback for individual membership storage"""
-        try:
-            print("Trying individual membership upserts...")
-            success_count = 0
-            
-            for membership_record in memberships_data:
-                try:
-                    # Try insert first, then update if exists
-                    try:
-                        result = self.client.table('league_memberships').insert(membership_record).execute()
-                        success_count += 1
-                    except Exception as insert_error:
-                        if "duplicate key value violates unique constraint" in str(insert_error).lower():
-                            # Membership exists, try update
-                            update_record = {k: v for k, v in membership_record.items() 
-                                           if k not in ['league_id', 'entry_id']}
-                            result = self.client.table('league_memberships')\
-                                .update(update_record)\
-                                .eq('league_id', membership_record['league_id'])\
-                                .eq('entry_id', membership_record['entry_id'])\
-                                .execute()
-                            success_count += 1
-                        else:
-                            raise insert_error
-                        
-                except Exception as member_error:
-                    print(f"Failed to store membership {membership_record.get('entry_id')}: {member_error}")
-                    continue
-            
-            print(f"Individual membership inserts: {success_count}/{len(memberships_data)} memberships stored")
-            return success_count > 0
-            
-        except Exception as e:
-            print(f"Individual membership inserts failed: {e}")
-            return False
+        """Fallback for membership storage in fixed-size upsert batches"""
+        log.info("Trying batched membership upserts (%d per batch)...", UPSERT_BATCH_SIZE)
+        return self._chunked_upsert('league_memberships', memberships_data, on_conflict='league_id,entry_id') > 0
 
     def store_fpl_footballers(self, footballers_df: pd.DataFrame) -> bool:
         """Store FPL footballers data - SCHEMA ALIGNED"""
         try:
             if footballers_df.empty:
-                print("No footballers data to store")
+                log.info("No footballers data to store")
                 return True
 
-            footballers_data = []
-            current_time = datetime.now().isoformat()
-            
-            for _, player in footballers_df.iterrows():
-                footballer_record = {
-                    'id': int(player['id']),
-                    'first_name': str(player.get('first_name', '')),
-                    'second_name': str(player.get('second_name', '')),
-                    'web_name': str(player['web_name']),
-                    'team_id': int(player.get('team', 0)) if player.get('team') else None,
-                    'element_type': int(player.get('element_type', 0)) if player.get('element_type') else None,
-                    'now_cost': int(player.get('now_cost', 0)) if player.get('now_cost') else None,
-                    'total_points': int(player.get('total_points', 0)) if player.get('total_points') else 0,
-                    'form': float(player.get('form', 0)) if player.get('form') and str(player.get('form')).replace('.', '').isdigit() else None,
-                    'selected_by_percent': float(player.get('selected_by_percent', 0)) if player.get('selected_by_percent') and str(player.get('selected_by_percent')).replace('.', '').isdigit() else None,
-                    'updated_at': current_time  # fpl_footballers table has updated_at
-                    # created_at will be set by DEFAULT now()
-                }
-                footballers_data.append(footballer_record)
-            
-            print(f"Attempting to store {len(footballers_data)} FPL footballers...")
+            frame = footballers_df.reindex(columns=[
+                'id', 'first_name', 'second_name', 'web_name', 'team', 'element_type',
+                'now_cost', 'total_points', 'form', 'selected_by_percent'
+            ])
+            
+            # Parse numeric columns in one C-level pass each; NaN marks missing/unparseable values
+            def numeric(column: str) -> pd.Series:
+                return pd.to_numeric(frame[column], errors='coerce')
+            
+            def optional_ints(column: str) -> pd.Series:
+                # 0 means "unknown" in the FPL payload for these columns
+                values = numeric(column)
+                return values.where(values != 0).astype('Int64')
+            
+            working = pd.DataFrame({
+                'id': numeric('id').astype(int),
+                'first_name': frame['first_name'].fillna('').astype(str),
+                'second_name': frame['second_name'].fillna('').astype(str),
+                'web_name': frame['web_name'].astype(str),
+                'team_id': optional_ints('team'),
+                'element_type': optional_ints('element_type'),
+                'now_cost': optional_ints('now_cost'),
+                'total_points': numeric('total_points').fillna(0).astype(int),
+                'form': numeric('form'),
+                'selected_by_percent': numeric('selected_by_percent')
+            })
+            # Nullable columns go out as JSON null rather than NaN/<NA>
+            working = working.astype(object).where(working.notna(), None)
+            
+            log.info("Attempting to store %d FPL footballers...", len(working))
+            
+            # Preferred path: one column-oriented payload (see supabase/migrations)
+            try:
+                columns = {key: working[key].tolist() for key in working.columns}
+                result = self.client.rpc('fpl_footballers_ingest', {'payload': columns}).execute()
+                log.info("FPL footballers ingest result: %s records processed", result.data)
+                return True
+            except Exception as rpc_error:
+                log.warning("fpl_footballers_ingest RPC failed, falling back to upsert: %s", rpc_error)
+            
+            # updated_at is stamped by trigger; created_at by DEFAULT now()
+            footballers_data = working.to_dict('records')
             
             # Upsert footballers data
-            result = self.client.table('fpl_footballers').upsert(
-                footballers_data,
-                on_conflict='id'
-            ).execute()
+            stored = self._bulk_upsert('fpl_footballers', footballers_data, on_conflict='id')
             
-            print(f"FPL footballers upsert result: {len(result.data)} records processed")
+            log.info("FPL footballers upsert result: %d records processed", stored)
             return True
             
         except Exception as e:
-            print(f"Error storing FPL footballers: {e}")
-            traceback.print_exc()
+            log.exception("Error storing FPL footballers: %s", e)
             return False
 
+    def _gameweek_records(self, gameweek_df: pd.DataFrame) -> List[Dict[str, Any]]:
+        """gameweek_data_new rows for a collected gameweek frame (rows without entry/league ids dropped)"""
+        # Every row of a collection run shares one gameweek, so resolve the column suffix once
+        gameweeks = pd.to_numeric(gameweek_df.get('gameweek', pd.Series([1])), errors='coerce')
+        current_gameweek = int(gameweeks.iloc[0]) if pd.notna(gameweeks.iloc[0]) else 1
+        gameweek_suffix = f"_{current_gameweek}"
+        
+        int_sources = {
+            'league_id': 'league_id',
+            'entry_id': 'Player Entry',
+            'points': f'points{gameweek_suffix}',
+            'total_points': 'Player Points',
+            'points_net': f'pointsnet{gameweek_suffix}',
+            'bank': f'bank{gameweek_suffix}',
+            'transfers': f'event_transfers{gameweek_suffix}',  # ✅ This should be the count
+            'transfers_cost': f'event_transfers_cost{gameweek_suffix}',  # ✅ This should be the cost
+            'points_on_bench': f'points_on_bench{gameweek_suffix}'
+        }
+        value_col = f'value{gameweek_suffix}'
+        frame = gameweek_df.reindex(columns=list(int_sources.values()) + [
+            value_col, 'captain_id', 'vice_captain_id', 'Captain', 'Vice-captain', 'Active chip'
+        ])
+        
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Available transfer columns for GW %s: %s", current_gameweek,
+                      [col for col in gameweek_df.columns if 'transfer' in col.lower()])
+        
+        # Drop rows without an entry or league id first so nothing below is spent on them
+        has_ids = pd.to_numeric(frame['Player Entry'], errors='coerce').fillna(0).ne(0) & \
+            pd.to_numeric(frame['league_id'], errors='coerce').fillna(0).ne(0)
+        frame = frame.loc[has_ids]
+        
+        def ints(column: str) -> pd.Series:
+            return pd.to_numeric(frame[column], errors='coerce').fillna(0).astype('int64')
+        
+        def optional_ids(column: str) -> pd.Series:
+            return pd.to_numeric(frame[column], errors='coerce').astype('Int64')
+        
+        def optional_text(values: pd.Series) -> pd.Series:
+            # Missing or empty strings are stored as NULL
+            values = values.astype(object)
+            present = values.notna() & (values != '')
+            return values.where(present, None).where(~present, values.astype(str))
+        
+        # Active chip arrives either as a scalar or as a one-element list
+        active_chips = frame['Active chip'].map(
+            lambda chip: (chip[0] if chip else None) if isinstance(chip, list) else chip
+        )
+        
+        # Every coercion runs on whole columns; rows are only materialised by to_dict below
+        working = pd.DataFrame({target: ints(source) for target, source in int_sources.items()})
+        working.insert(2, 'gameweek', current_gameweek)
+        # value was divided by 10 during collection - store it back in tenths
+        working.insert(7, 'team_value', (pd.to_numeric(frame[value_col], errors='coerce') * 10)
+                       .round().fillna(0).astype('int64'))
+        working['captain_id'] = optional_ids('captain_id')
+        working['captain_name'] = optional_text(frame['Captain'])
+        working['vice_captain_id'] = optional_ids('vice_captain_id')
+        working['vice_captain_name'] = optional_text(frame['Vice-captain'])
+        working['active_chip'] = optional_text(active_chips)
+        # updated_at is stamped by the gameweek_data_new_touch trigger
+        
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Transfers for GW %s: %s", current_gameweek,
+                      dict(zip(working['entry_id'].tolist(), working['transfers'].tolist())))
+        
+        return working.astype(object).where(working.notna(), None).to_dict('records')
+
     def store_gameweek_data_normalized(self, gameweek_df: pd.DataFrame) -> bool:
         """Store gameweek data using normalized schema - FIXED TRANSFER COUNT"""
         try:
-            gameweek_data = []
-            current_time = datetime.now().isoformat()
-            
-            def safe_int(value, default=0):
-                if pd.isna(value) or value is None or value == '':
-                    return default
-                try:
-                    if isinstance(value, str) and '.' in value:
-                        return int(float(value))
-                    return int(value)
-                except (ValueError, TypeError):
-                    return default
-            
-            def safe_str(value, default=None):
-                if pd.isna(value) or value is None:
-                    return default
-                return str(value) if value != '' else default
-            
-            for _, row in gameweek_df.iterrows():
-                current_gameweek = safe_int(row.get('gameweek', 1), 1)
-                
-                # Handle active_chip
-                active_chip = row.get('Active chip')
-                if isinstance(active_chip, list):
-                    active_chip = active_chip[0] if len(active_chip) > 0 and active_chip[0] is not None else None
-                active_chip = safe_str(active_chip)
-                
-                # Extract captain/vice-captain IDs
-                captain_id = safe_int(row.get('captain_id')) if row.get('captain_id') is not None else None
-                vice_captain_id = safe_int(row.get('vice_captain_id')) if row.get('vice_captain_id') is not None else None
-                
-                # Dynamic gameweek suffix
-                gameweek_suffix = f"_{current_gameweek}"
-                
-                # DEBUG: Print available columns to see transfer data
-                available_cols = [col for col in row.index if 'transfer' in col.lower()]
-                print(f"Available transfer columns for GW {current_gameweek}: {available_cols}")
-                
-                gameweek_record = {
-                    'league_id': safe_int(row.get('league_id')),
-                    'entry_id': safe_int(row.get('Player Entry')),
-                    'gameweek': current_gameweek,
-                    'points': safe_int(row.get(f'points{gameweek_suffix}')),
-                    'total_points': safe_int(row.get('Player Points')),
-                    'points_net': safe_int(row.get(f'pointsnet{gameweek_suffix}')),
-                    'bank': safe_int(row.get(f'bank{gameweek_suffix}')),
-                    'team_value': safe_int(row.get(f'value{gameweek_suffix}', 0) * 10 if row.get(f'value{gameweek_suffix}') is not None else 0),
-                    'transfers': safe_int(row.get(f'event_transfers{gameweek_suffix}')),  # ✅ This should be the count
-                    'transfers_cost': safe_int(row.get(f'event_transfers_cost{gameweek_suffix}')),  # ✅ This should be the cost
-                    'points_on_bench': safe_int(row.get(f'points_on_bench{gameweek_suffix}')),
-                    'captain_id': captain_id,
-                    'captain_name': safe_str(row.get('Captain')),
-                    'vice_captain_id': vice_captain_id,
-                    'vice_captain_name': safe_str(row.get('Vice-captain')),
-                    'active_chip': active_chip,
-                    'updated_at': current_time
-                }
-                
-                # DEBUG: Print transfer data for troubleshooting
-                print(f"Player {row.get('Player Entry')}: transfers={gameweek_record['transfers']}, cost={gameweek_record['transfers_cost']}")
-                
-                if gameweek_record['entry_id'] and gameweek_record['league_id']:
-                    gameweek_data.append(gameweek_record)
+            if gameweek_df.empty:
+                log.warning("No valid gameweek data to store")
+                return False
+            
+            gameweek_data = self._gameweek_records(gameweek_df)
             
             if not gameweek_data:
-                print("No valid gameweek data to store")
+                log.warning("No valid gameweek data to store")
                 return False
             
-            print(f"Attempting to store {len(gameweek_data)} records in normalized schema...")
-            print(f"Sample gameweek record: {gameweek_data[0] if gameweek_data else 'No data'}")
+            log.info("Attempting to store %d records in normalized schema...", len(gameweek_data))
+            log.debug("Sample gameweek record: %s", gameweek_data[0] if gameweek_data else 'No data')
             
             # Upsert to normalized table
-            result = self.client.table('gameweek_data_new').upsert(
-                gameweek_data,
-                on_conflict='league_id,entry_id,gameweek'
-            ).execute()
+            stored = self._upsert_gameweek_rows(gameweek_data)
             
-            print(f"Successfully stored {len(result.data)} records")
-            return len(result.data) > 0
+            log.info("Successfully stored %d records", stored)
+            if stored:
+                self._invalidate_result_cache({record['league_id'] for record in gameweek_data})
+            return stored > 0
             
         except Exception as e:
-            print(f"Error storing normalized gameweek data: {e}")
-            traceback.print_exc()
+            log.exception("Error storing normalized gameweek data: %s", e)
             return False
 
+    def _upsert_gameweek_rows(self, gameweek_data: List[Dict[str, Any]]) -> int:
+        """COPY for large loads when a direct DB URL is configured, else batched PostgREST upserts"""
+        if SUPABASE_DB_URL and len(gameweek_data) >= COPY_MIN_ROWS:
+            try:
+                return self._bulk_upsert_copy('gameweek_data_new', gameweek_data,
+                                              key_columns=('league_id', 'entry_id', 'gameweek'))
+            except Exception as copy_error:
+                log.warning("COPY load failed, using PostgREST upserts: %s", copy_error)
+        
+        try:
+            return self._bulk_upsert('gameweek_data_new', gameweek_data,
+                                     on_conflict='league_id,entry_id,gameweek')
+        except Exception as bulk_error:
+            log.warning("Bulk gameweek upsert failed, retrying chunk by chunk: %s", bulk_error)
+            return self._chunked_upsert('gameweek_data_new', gameweek_data,
+                                        on_conflict='league_id,entry_id,gameweek')
+
+    def _bulk_upsert_copy(self, table: str, rows: List[Dict[str, Any]], key_columns: Tuple[str, ...]) -> int:
+        """
+        COPY rows into a temp table and merge them with one INSERT ... ON CONFLICT, all in a
+        single transaction on SUPABASE_DB_URL. Returns the number of rows inserted or updated.
+        """
+        import psycopg  # optional dependency - only needed when SUPABASE_DB_URL is set
+        from psycopg import sql
+        
+        columns = list(rows[0])
+        staging = sql.Identifier(f'_staging_{table}')
+        column_list = sql.SQL(', ').join(map(sql.Identifier, columns))
+        
+        with psycopg.connect(SUPABASE_DB_URL) as conn, conn.cursor() as cur:
+            # Same column types as the target, none of its constraints or triggers
+            cur.execute(sql.SQL(
+                "CREATE TEMP TABLE {staging} ON COMMIT DROP AS SELECT {columns} FROM {table} WITH NO DATA"
+            ).format(staging=staging, columns=column_list, table=sql.Identifier(table)))
+            
+            with cur.copy(sql.SQL("COPY {staging} ({columns}) FROM STDIN").format(
+                    staging=staging, columns=column_list)) as copy:
+                for row in rows:
+                    copy.write_row([row[column] for column in columns])
+            
+            cur.execute(sql.SQL(
+                "INSERT INTO {table} ({columns}) SELECT {columns} FROM {staging} "
+                "ON CONFLICT ({keys}) DO UPDATE SET {updates}"
+            ).format(
+                table=sql.Identifier(table),
+                columns=column_list,
+                staging=staging,
+                keys=sql.SQL(', ').join(map(sql.Identifier, key_columns)),
+                updates=sql.SQL(', ').join(
+                    sql.SQL("{column} = EXCLUDED.{column}").format(column=sql.Identifier(column))
+                    for column in columns if column not in key_columns
+                )
+            ))
+            return cur.rowcount
+
+    @staticmethod
+    def _chip_records(chips_df: pd.DataFrame) -> List[Dict[str, Any]]:
+        # created_at will be set automatically by DEFAULT now()
+        # Note: chip_usage_new table doesn't have updated_at
+        # One row per chip use - an upsert batch must not touch the same key twice
+        return chips_df[['league_id', 'entry_id', 'name', 'event']]\
+            .astype({'league_id': int, 'entry_id': int, 'name': str, 'event': int})\
+            .rename(columns={'name': 'chip_name', 'event': 'gameweek_used'})\
+            .drop_duplicates(subset=CHIP_USAGE_KEY.split(','))\
+            .to_dict('records')
+
     def store_chip_usage_normalized(self, chips_df: pd.DataFrame) -> bool:
         """Store chip usage in normalized schema - SCHEMA ALIGNED"""
         try:
             if chips_df.empty:
-                print("No chip data to store")
+                log.info("No chip data to store")
                 return True
                 
-            chips_data = []
-            for _, chip in chips_df.iterrows():
-                chip_record = {
-                    'league_id': int(chip.get('league_id')),
-                    'entry_id': int(chip.get('entry_id')),
-                    'chip_name': str(chip.get('name')),
-                    'gameweek_used': int(chip.get('event'))
-                    # created_at will be set automatically by DEFAULT now()
-                    # Note: chip_usage_new table doesn't have updated_at
-                }
-                chips_data.append(chip_record)
-            
-            print(f"Attempting to store {len(chips_data)} chip usage records...")
-            
-            result = self.client.table('chip_usage_new').upsert(
-                chips_data,
-                on_conflict='league_id,entry_id,chip_name'  # Matches the unique constraint
-            ).execute()
+            chips_data = self._chip_records(chips_df)
+            
+            log.info("Attempting to store %d chip usage records...", len(chips_data))
             
-            print(f"Chip usage upsert result: {len(result.data)} records processed")
+            try:
+                stored = self._bulk_upsert(
+                    'chip_usage_new',
+                    chips_data,
+                    on_conflict=CHIP_USAGE_KEY  # Matches the unique constraint
+                )
+            except Exception as bulk_error:
+                log.warning("Bulk chip upsert failed, retrying chunk by chunk: %s", bulk_error)
+                stored = self._chunked_upsert('chip_usage_new', chips_data, on_conflict=CHIP_USAGE_KEY)
+                if not stored:
+                    return False
+            
+            log.info("Chip usage upsert result: %d records processed", stored)
             return True
             
         except Exception as e:
-            print(f"Error storing normalized chip usage: {e}")
-            traceback.print_exc()
+            log.exception("Error storing normalized chip usage: %s", e)
             return False
     
+    def store_gameweek_with_chips(self, gameweek_df: pd.DataFrame, chips_df: pd.DataFrame) -> Tuple[bool, bool]:
+        """
+        Store a collected gameweek and its chip usage in one transaction via the ingest_gameweek RPC.
+        Falls back to the separate store_* writers; returns (gameweek_success, chip_success).
+        """
+        try:
+            gameweek_data = self._gameweek_records(gameweek_df) if not gameweek_df.empty else []
+            chips_data = self._chip_records(chips_df) if not chips_df.empty else []
+            
+            if gameweek_data:
+                result = self.client.rpc('ingest_gameweek', {
+                    'p_data': gameweek_data,
+                    'p_chips': chips_data
+                }).execute()
+                log.info("ingest_gameweek stored %s gameweek records and %d chip records",
+                         result.data, len(chips_data))
+                self._invalidate_result_cache({record['league_id'] for record in gameweek_data})
+                return True, True
+                
+        except Exception as e:
+            log.warning("ingest_gameweek RPC failed, storing gameweek and chips separately: %s", e)
+        
+        return self.store_gameweek_data_normalized(gameweek_df), self.store_chip_usage_normalized(chips_df)
+
+    def get_cached_picks(self, entry_ids: List[int], gameweek: int) -> Dict[int, Dict[str, Any]]:
+        """Stored picks payloads for these managers in a gameweek, keyed by entry_id ({} on failure)"""
+        if not entry_ids:
+            return {}
+        try:
+            response = self.client.table('picks_cache')\
+                .select('entry_id, payload')\
+                .eq('gameweek', gameweek)\
+                .in_('entry_id', entry_ids)\
+                .execute()
+            return {int(row['entry_id']): row['payload'] for row in response.data or []}
+        except Exception as e:
+            log.warning("Error reading picks cache: %s", e)
+            return {}
+
+    def store_picks(self, gameweek: int, payloads: Dict[int, Dict[str, Any]]) -> bool:
+        """Cache picks payloads for a gameweek whose deadline has passed (picks can no longer change)"""
+        if not payloads:
+            return True
+        try:
+            stored = self._bulk_upsert('picks_cache', [
+                {'entry_id': int(entry_id), 'gameweek': int(gameweek), 'payload': payload}
+                for entry_id, payload in payloads.items()
+            ], on_conflict='entry_id,gameweek')
+            log.info("Cached picks for %d managers in GW %s", stored, gameweek)
+            return True
+        except Exception as e:
+            log.warning("Error caching picks: %s", e)
+            return False
+
     def get_smart_gameweek_for_standings(self, league_id: int, requested_gameweek: Optional[int] = None) -> int:
         """
         Determine which gameweek to use for standings based on data availability
         Returns the gameweek that has the most recent meaningful data
         """
+        if requested_gameweek is not None:
+            return requested_gameweek
+        
         try:
-            if requested_gameweek:
-                return requested_gameweek
-            
             current_gw = self.get_current_gameweek() or 1
             
-            # Check if current gameweek has meaningful data (non-zero points)
-            response = self.client.table('gameweek_data_new')\
-                .select('points, gameweek')\
-                .eq('league_id', league_id)\
-                .eq('gameweek', current_gw)\
-                .gt('points', 0)\
-                .limit(1)\
-                .execute()
+            cache_key = (league_id, current_gw)
+            generation = _data_generation(league_id)
+            cached = _smart_gw_cache.get(cache_key)
+            if cached and time.time() - cached[0] < SMART_GAMEWEEK_CACHE_TTL and cached[1] == generation:
+                return cached[2]
             
-            # If current gameweek has data with points > 0, use it
-            if response.data:
-                print(f"Using current gameweek {current_gw} (has active data)")
-                return current_gw
-            
-            # Otherwise, check previous gameweek
-            previous_gw = max(1, current_gw - 1)
-            previous_response = self.client.table('gameweek_data_new')\
-                .select('points, gameweek')\
-                .eq('league_id', league_id)\
-                .eq('gameweek', previous_gw)\
-                .limit(1)\
-                .execute()
-            
-            if previous_response.data:
-                print(f"Using previous gameweek {previous_gw} (current gameweek {current_gw} not started)")
-                return previous_gw
+            try:
+                # Both existence checks in one round trip (see supabase/migrations)
+                response = self.client.rpc('smart_gameweek', {
+                    'p_league_id': league_id,
+                    'p_current_gw': current_gw
+                }).execute()
+                target_gameweek = int(response.data) if response.data else current_gw
+            except Exception as rpc_error:
+                log.warning("smart_gameweek RPC failed, probing tables directly: %s", rpc_error)
+                target_gameweek = self._probe_smart_gameweek(league_id, current_gw)
+            
+            _smart_gw_cache[cache_key] = (time.time(), generation, target_gameweek)
+            return target_gameweek
             
-            print(f"Using current gameweek {current_gw} (fallback)")
+        except Exception as e:
+            log.error("Error determining smart gameweek: %s", e)
+            return self.get_current_gameweek() or 1
+
+    def _probe_smart_gameweek(self, league_id: int, current_gw: int) -> int:
+        """Client-side version of the smart_gameweek RPC"""
+        # Check if current gameweek has meaningful data (non-zero points)
+        response = self.client.table('gameweek_data_new')\
+            .select('points, gameweek')\
+            .eq('league_id', league_id)\
+            .eq('gameweek', current_gw)\
+            .gt('points', 0)\
+            .limit(1)\
+            .execute()
+        
+        # If current gameweek has data with points > 0, use it
+        if response.data:
+            log.debug("Using current gameweek %s (has active data)", current_gw)
             return current_gw
+        
+        # Otherwise, check previous gameweek
+        previous_gw = max(1, current_gw - 1)
+        previous_response = self.client.table('gameweek_data_new')\
+            .select('points, gameweek')\
+            .eq('league_id', league_id)\
+            .eq('gameweek', previous_gw)\
+            .limit(1)\
+            .execute()
+        
+        if previous_response.data:
+            log.debug("Using previous gameweek %s (current gameweek %s not started)", previous_gw, current_gw)
+            return previous_gw
+        
+        log.debug("Using current gameweek %s (fallback)", current_gw)
+        return current_gw
+
+    def get_league_standings_normalized(self, league_id: int, gameweek: Optional[int] = None,
+                                        limit: Optional[int] = None, offset: int = 0) -> pd.DataFrame:
+        """Get league standings using smart gameweek selection, optionally one page of limit rows"""
+        try:
+            # Use smart gameweek selection only when the caller did not pick one
+            target_gameweek = gameweek if gameweek is not None else self.get_smart_gameweek_for_standings(league_id)
+            return self._query_standings_view(league_id, target_gameweek, limit, offset)
             
         except Exception as e:
-            print(f"Error determining smart gameweek: {e}")
-            return self.get_current_gameweek() or 1
+            log.warning("Error getting league standings from view: %s", e)
+            return self._get_standings_fallback(league_id, gameweek, limit, offset)
 
-    def get_league_standings_normalized(self, league_id: int, gameweek: Optional[int] = None) -> pd.DataFrame:
-        """Get league standings using smart gameweek selection"""
+    async def get_league_standings_normalized_async(self, league_id: int, gameweek: Optional[int] = None,
+                                                    limit: Optional[int] = None, offset: int = 0) -> pd.DataFrame:
+        """Async variant of get_league_standings_normalized - blocking calls run in worker threads"""
         try:
-            # Use smart gameweek selection
-            target_gameweek = self.get_smart_gameweek_for_standings(league_id, gameweek)
+            target_gameweek = gameweek if gameweek is not None else \
+                await asyncio.to_thread(self.get_smart_gameweek_for_standings, league_id)
+            return await asyncio.to_thread(self._query_standings_view, league_id, target_gameweek, limit, offset)
             
-            response = self.client.table('league_standings_view')\
-                .select('*')\
+        except Exception as e:
+            log.warning("Error getting league standings from view: %s", e)
+            return await self._get_standings_fallback_async(league_id, gameweek, limit, offset)
+
+    async def get_league_async(self, league_id: int) -> Optional[Dict[str, Any]]:
+        """League row (id, name, updated_at), served from the short-lived league cache when fresh"""
+        return await asyncio.to_thread(self._fetch_league, league_id)
+
+    async def get_league_summary_async(self, league_id: int) -> Dict[str, Any]:
+        """League row, current standings and latest stored gameweek in one league_summary RPC"""
+        try:
+            return await asyncio.to_thread(self._league_summary_rpc, league_id)
+        except Exception as e:
+            log.warning("league_summary RPC failed, querying separately: %s", e)
+        
+        # Fallback: the three reads run concurrently
+        league_info, standings, latest_gameweek = await asyncio.gather(
+            asyncio.to_thread(self._fetch_league, league_id),
+            self.get_league_standings_normalized_async(league_id),
+            asyncio.to_thread(self._fetch_latest_gameweek, league_id)
+        )
+        return {
+            'league_info': league_info,
+            'standings': standings,
+            'latest_gameweek': latest_gameweek
+        }
+
+    def _league_summary_rpc(self, league_id: int) -> Dict[str, Any]:
+        response = self.client.rpc('league_summary', {
+            'p_league_id': league_id,
+            'p_current_gw': self.get_current_gameweek() or 1
+        }).execute()
+        data = response.data or {}
+        
+        standings = pd.DataFrame(data.get('standings') or [])
+        if not standings.empty:
+            standings['selected_gameweek'] = data.get('selected_gameweek')
+        return {
+            'league_info': data.get('league_info'),
+            'standings': standings,
+            'latest_gameweek': data.get('latest_gameweek')
+        }
+
+    def _fetch_league(self, league_id: int) -> Optional[Dict[str, Any]]:
+        cached = _league_cache.get(league_id)
+        if cached and time.time() - cached[0] < LEAGUE_CACHE_TTL:
+            return cached[1]
+        
+        response = self.client.table('leagues')\
+            .select('id, name, updated_at')\
+            .eq('id', league_id)\
+            .limit(1)\
+            .execute()
+        league = response.data[0] if response.data else None
+        if league is not None:
+            _league_cache[league_id] = (time.time(), league)
+        return league
+
+    def _fetch_latest_gameweek(self, league_id: int) -> Optional[int]:
+        try:
+            response = self.client.rpc('latest_gameweek', {'p_league_id': league_id}).execute()
+            return int(response.data) if response.data is not None else None
+        except Exception as rpc_error:
+            log.warning("latest_gameweek RPC failed, querying table: %s", rpc_error)
+        
+        response = self.client.table('gameweek_data_new')\
+            .select('gameweek')\
+            .eq('league_id', league_id)\
+            .order('gameweek', desc=True)\
+            .limit(1)\
+            .execute()
+        return int(response.data[0]['gameweek']) if response.data else None
+
+    def _query_standings_view(self, league_id: int, target_gameweek: int,
+                              limit: Optional[int] = None, offset: int = 0) -> pd.DataFrame:
+        """Read one gameweek of league_standings_view - the view ranks rows (league_position)"""
+        cache_key = ('standings', league_id, target_gameweek, limit, offset)
+        cached = _cached_result(cache_key)
+        if cached is not None:
+            return cached
+        
+        query = self.client.table('league_standings_view')\
+            .select(STANDINGS_COLUMNS)\
+            .eq('league_id', league_id)\
+            .eq('gameweek', target_gameweek)\
+            .order('league_position')
+        if limit is not None:
+            query = query.range(offset, offset + limit - 1)
+        response = query.execute()
+        
+        if response.data:
+            df = _records_frame(response.data, STANDINGS_COLUMNS, STANDINGS_DTYPES)
+            df['selected_gameweek'] = target_gameweek  # Add this for reference
+            return _store_result(cache_key, df)
+        
+        return pd.DataFrame()
+
+    def _fetch_gameweek_rows(self, league_id: int, target_gameweek: int) -> List[Dict[str, Any]]:
+        response = self.client.table('gameweek_data_new')\
+            .select(STANDINGS_FALLBACK_COLUMNS)\
+            .eq('league_id', league_id)\
+            .eq('gameweek', target_gameweek)\
+            .order('total_points', desc=True)\
+            .execute()
+        return response.data or []
+
+    def _cached_rows(self, key: str, loader) -> List[Dict[str, Any]]:
+        """Return rows from Redis when configured, otherwise (or on a miss) from loader()"""
+        if _redis is not None:
+            try:
+                cached = _redis.get(key)
+                if cached:
+                    return orjson.loads(cached)
+            except Exception as e:
+                log.warning("Redis get failed for %s: %s", key, e)
+        
+        rows = loader()
+        
+        if _redis is not None and rows:
+            try:
+                _redis.setex(key, LOOKUP_CACHE_TTL, orjson.dumps(rows))
+            except Exception as e:
+                log.warning("Redis set failed for %s: %s", key, e)
+        return rows
+
+    def _invalidate_lookup_cache(self, league_id: int) -> None:
+        _redis_delete_prefix(f'gp:{league_id}:')
+        if _redis is not None:
+            try:
+                _redis.delete(f'lm:{league_id}')
+            except Exception as e:
+                log.warning("Redis invalidation failed for league %s: %s", league_id, e)
+
+    def _invalidate_player_name_cache(self) -> None:
+        # A player can be in any number of leagues, so a rename retires every league's name lookups
+        _redis_delete_prefix('gp:')
+
+    def get_shared_response(self, key: str) -> Optional[Any]:
+        """Formatted API response cached in Redis by any worker, or None (also when Redis is not configured)"""
+        if _redis is None:
+            return None
+        try:
+            cached = _redis.get(key)
+            return orjson.loads(cached) if cached else None
+        except Exception as e:
+            log.warning("Redis get failed for %s: %s", key, e)
+            return None
+
+    def set_shared_response(self, key: str, response: Any, ttl: int) -> None:
+        if _redis is not None:
+            try:
+                _redis.setex(key, ttl, orjson.dumps(response))
+            except Exception as e:
+                log.warning("Redis set failed for %s: %s", key, e)
+
+    def delete_shared_responses(self, prefix: str) -> None:
+        """Drop every shared response whose key starts with prefix"""
+        _redis_delete_prefix(prefix)
+
+    def data_generation(self, league_id: int) -> int:
+        """Current data generation of a league - shared by all workers when REDIS_URL is set"""
+        return _data_generation(league_id)
+
+    def bump_data_generation(self, league_ids: Set[int]) -> None:
+        """Retire every worker's cached frames and responses for these leagues (and all cross-league frames)"""
+        _bump_generations(set(league_ids) | {CROSS_LEAGUE_SCOPE})
+
+    def _invalidate_result_cache(self, league_ids: Set[int]) -> None:
+        """Drop cached standings/captain frames for these leagues and all cross-league frames after new gameweek data lands"""
+        self.bump_data_generation(league_ids)
+        for key in list(_result_cache):
+            if key[0] == 'cross_league' or key[1] in league_ids:
+                _result_cache.pop(key, None)
+        for key in list(_smart_gw_cache):
+            if key[0] in league_ids:
+                _smart_gw_cache.pop(key, None)
+
+    def _fetch_player_names(self, league_id: int, entry_ids: List[int]) -> List[Dict[str, Any]]:
+        def load():
+            response = self.client.table('global_players')\
+                .select('entry_id, player_name')\
+                .in_('entry_id', entry_ids)\
+                .execute()
+            return response.data or []
+        # global_players has no league column, so the key names the exact entry set (members differ by gameweek)
+        digest = hashlib.sha1(orjson.dumps(sorted(entry_ids))).hexdigest()
+        return self._cached_rows(f'gp:{league_id}:{digest}', load)
+
+    def _fetch_team_names(self, league_id: int) -> List[Dict[str, Any]]:
+        def load():
+            # The whole league, so one cached entry serves every gameweek (extra members are dropped by the merge)
+            response = self.client.table('league_memberships')\
+                .select('entry_id, team_name')\
                 .eq('league_id', league_id)\
-                .eq('gameweek', target_gameweek)\
-                .order('total_points', desc=True)\
                 .execute()
-            
-            if response.data:
-                df = pd.DataFrame(response.data)
-                df = df.sort_values('total_points', ascending=False).reset_index(drop=True)
-                df['league_position'] = df.index + 1
-                df['selected_gameweek'] = target_gameweek  # Add this for reference
-                return df
-            
-            return pd.DataFrame()
-            
-        except Exception as e:
-            print(f"Error getting league standings from view: {e}")
-            return self._get_standings_fallback(league_id, gameweek)
+            return response.data or []
+        return self._cached_rows(f'lm:{league_id}', load)
 
-    def _get_standings_fallback(self, league_id: int, gameweek: Optional[int] = None) -> pd.DataFrame:
+    def _combine_standings_rows(self, gw_rows: List[Dict[str, Any]], players_rows: List[Dict[str, Any]],
+                                memberships_rows: List[Dict[str, Any]], target_gameweek: int) -> pd.DataFrame:
+        """Attach player/team names to gameweek rows (already ordered by total_points) and rank them"""
+        # Hash-join on entry_id in pandas instead of building lookup dicts and probing per row;
+        # left merges keep the left frame's order, so the server-side ordering survives
+        df = pd.DataFrame(gw_rows)\
+            .merge(pd.DataFrame(players_rows, columns=['entry_id', 'player_name']), on='entry_id', how='left')\
+            .merge(pd.DataFrame(memberships_rows, columns=['entry_id', 'team_name']), on='entry_id', how='left')
+        df['player_name'] = df['player_name'].fillna('Unknown Player')
+        df['team_name'] = df['team_name'].fillna('Unknown Team')
+        df['selected_gameweek'] = target_gameweek
+        
+        df['league_position'] = np.arange(1, len(df) + 1)
+        return df
+
+    @staticmethod
+    def _page(df: pd.DataFrame, limit: Optional[int], offset: int) -> pd.DataFrame:
+        """Client-side equivalent of .range() for the fallback paths"""
+        if limit is None:
+            return df.iloc[offset:] if offset else df
+        return df.iloc[offset:offset + limit]
+
+    def _get_standings_fallback(self, league_id: int, gameweek: Optional[int] = None,
+                                limit: Optional[int] = None, offset: int = 0) -> pd.DataFrame:
         """Fallback method with smart gameweek selection"""
         try:
             # Use smart gameweek selection in fallback too
-            target_gameweek = self.get_smart_gameweek_for_standings(league_id, gameweek)
+            target_gameweek = gameweek if gameweek is not None else self.get_smart_gameweek_for_standings(league_id)
             
             # Get gameweek data for the smart-selected gameweek
-            gw_response = self.client.table('gameweek_data_new')\
-                .select('*')\
-                .eq('league_id', league_id)\
-                .eq('gameweek', target_gameweek)\
-                .execute()
-            
-            if not gw_response.data:
+            gw_rows = self._fetch_gameweek_rows(league_id, target_gameweek)
+            if not gw_rows:
                 return pd.DataFrame()
             
-            # Rest of the fallback logic remains the same...
-            entry_ids = [row['entry_id'] for row in gw_response.data]
-            players_response = self.client.table('global_players')\
-                .select('entry_id, player_name')\
-                .in_('entry_id', entry_ids)\
-                .execute()
+            entry_ids = [row['entry_id'] for row in gw_rows]
+            players_rows = self._fetch_player_names(league_id, entry_ids)
+            memberships_rows = self._fetch_team_names(league_id)
             
-            memberships_response = self.client.table('league_memberships')\
-                .select('entry_id, team_name')\
-                .eq('league_id', league_id)\
-                .in_('entry_id', entry_ids)\
-                .execute()
+            df = self._combine_standings_rows(gw_rows, players_rows, memberships_rows, target_gameweek)
+            return self._page(df, limit, offset)
             
-            player_names = {p['entry_id']: p['player_name'] for p in players_response.data}
-            team_names = {m['entry_id']: m['team_name'] for m in memberships_response.data}
-            
-            combined_data = []
-            for row in gw_response.data:
-                entry_id = row['entry_id']
-                combined_row = {
-                    **row,
-                    'player_name': player_names.get(entry_id, 'Unknown Player'),
-                    'team_name': team_names.get(entry_id, 'Unknown Team'),
-                    'selected_gameweek': target_gameweek
-                }
-                combined_data.append(combined_row)
-            
-            df = pd.DataFrame(combined_data)
-            df = df.sort_values('total_points', ascending=False).reset_index(drop=True)
-            df['league_position'] = df.index + 1
-            return df
+        except Exception as e:
+            log.error("Fallback query also failed: %s", e)
+            return pd.DataFrame()
+
+    async def _get_standings_fallback_async(self, league_id: int, gameweek: Optional[int] = None,
+                                            limit: Optional[int] = None, offset: int = 0) -> pd.DataFrame:
+        """Async fallback - the name lookups only depend on entry_ids, so they run concurrently"""
+        try:
+            target_gameweek = gameweek if gameweek is not None else \
+                await asyncio.to_thread(self.get_smart_gameweek_for_standings, league_id)
+            
+            gw_rows = await asyncio.to_thread(self._fetch_gameweek_rows, league_id, target_gameweek)
+            if not gw_rows:
+                return pd.DataFrame()
+            
+            entry_ids = [row['entry_id'] for row in gw_rows]
+            players_rows, memberships_rows = await asyncio.gather(
+                asyncio.to_thread(self._fetch_player_names, league_id, entry_ids),
+                asyncio.to_thread(self._fetch_team_names, league_id)
+            )
+            
+            df = self._combine_standings_rows(gw_rows, players_rows, memberships_rows, target_gameweek)
+            return self._page(df, limit, offset)
             
         except Exception as e:
-            print(f"Fallback query also failed: {e}")
+            log.error("Async fallback query also failed: %s", e)
             return pd.DataFrame()
 
     def get_captain_analysis_normalized(self, league_id: int) -> pd.DataFrame:
-        """Get captain analysis using database view - SCALABLE APPROACH"""
+        """Get captain analysis from captain_analysis_view - aggregation runs in Postgres"""
+        cache_key = ('captain', league_id)
+        cached = _cached_result(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
             response = self.client.table('captain_analysis_view')\
-                .select('*')\
+                .select(CAPTAIN_COLUMNS)\
                 .eq('league_id', league_id)\
                 .order('total_points', desc=True)\
                 .execute()
             
             if response.data:
-                return pd.DataFrame(response.data)
+                return _store_result(cache_key, _records_frame(response.data, CAPTAIN_COLUMNS))
             
             return pd.DataFrame()
             
         except Exception as e:
-            print(f"Error getting captain analysis from view: {e}")
-            # FALLBACK: Use simple aggregation query
-            return self._get_captain_analysis_fallback(league_id)
-        
+            log.warning("Error getting captain analysis from view: %s", e)
+            return _store_result(cache_key, self._get_captain_analysis_fallback(league_id))
+
     def _get_captain_analysis_fallback(self, league_id: int) -> pd.DataFrame:
-        """Fallback captain analysis using application-level aggregation"""
+        """Same aggregation as captain_analysis_view, done with a pandas groupby over the raw rows"""
         try:
             response = self.client.table('gameweek_data_new')\
                 .select('captain_id, captain_name, points')\
@@ -590,72 +1215,262 @@ class FPLDatabase:
                 .not_.is_('captain_name', 'null')\
                 .execute()
             
-            if response.data:
-                # Process manually for aggregation (same as before)
-                captain_stats = {}
-                for record in response.data:
-                    captain_name = record['captain_name']
-                    if captain_name not in captain_stats:
-                        captain_stats[captain_name] = {
-                            'captain_id': record['captain_id'],
-                            'captain_name': captain_name,
-                            'times_captained': 0,
-                            'total_points': 0,
-                            'points_list': []
-                        }
-                    
-                    captain_stats[captain_name]['times_captained'] += 1
-                    captain_stats[captain_name]['total_points'] += record['points']
-                    captain_stats[captain_name]['points_list'].append(record['points'])
-                
-                # Convert to DataFrame
-                captain_data = []
-                for stats in captain_stats.values():
-                    if stats['times_captained'] > 0:
-                        captain_data.append({
-                            'captain_id': stats['captain_id'],
-                            'captain_name': stats['captain_name'],
-                            'times_captained': stats['times_captained'],
-                            'total_points': stats['total_points'],
-                            'average_points': round(stats['total_points'] / stats['times_captained'], 1),
-                            'best_performance': max(stats['points_list']) if stats['points_list'] else 0,
-                            'worst_performance': min(stats['points_list']) if stats['points_list'] else 0
-                        })
-                
-                return pd.DataFrame(captain_data).sort_values('total_points', ascending=False)
+            if not response.data:
+                return pd.DataFrame()
             
-            return pd.DataFrame()
+            df = pd.DataFrame(response.data)
+            agg = df.groupby(['captain_id', 'captain_name'], sort=False)['points'].agg(
+                times_captained='count',
+                total_points='sum',
+                average_points='mean',
+                best_performance='max',
+                worst_performance='min'
+            ).reset_index()
+            agg['average_points'] = agg['average_points'].round(1)
+            
+            # Groups come out unsorted; the one ordering that matters is by total, same as the view
+            return agg.sort_values('total_points', ascending=False, kind='stable').reset_index(drop=True)
             
         except Exception as e:
-            print(f"Captain analysis fallback failed: {e}")
+            log.exception("Error in captain analysis fallback: %s", e)
             return pd.DataFrame()
 
-    def get_player_cross_league_stats(self, entry_id: int) -> pd.DataFrame:
-        """Get player's performance across all leagues"""
+    def get_league_manager_rows(self, league_id: int) -> List[Dict[str, Any]]:
+        """Every stored gameweek row of a league with player/team names, flat from league_standings_view, highest total first"""
+        response = self.client.table('league_standings_view')\
+            .select(MANAGER_ROW_COLUMNS)\
+            .eq('league_id', league_id)\
+            .order('total_points', desc=True)\
+            .execute()
+        return response.data or []
+
+    def get_league_stats(self, league_id: int) -> Dict[str, Any]:
+        """
+        Member/gameweek counts and score/transfer aggregates for a league from the league_stats RPC.
+        Score fields are None when no non-zero scores are stored; falls back to aggregating the rows here
+        """
+        try:
+            response = self.client.rpc('league_stats', {'p_league_id': league_id}).execute()
+            if response.data:
+                return response.data
+        except Exception as rpc_error:
+            log.warning("league_stats RPC failed, aggregating rows: %s", rpc_error)
+        
+        # Count only - count=exact with head=True returns no rows
+        memberships = self.client.table('league_memberships')\
+            .select('entry_id', count='exact', head=True)\
+            .eq('league_id', league_id)\
+            .execute()
+        rows = self.client.table('gameweek_data_new')\
+            .select('gameweek, points, transfers, transfers_cost')\
+            .eq('league_id', league_id)\
+            .execute().data or []
+        
+        points = [row['points'] for row in rows if row['points']]
+        return {
+            'total_players': memberships.count or 0,
+            'total_gameweeks': len({row['gameweek'] for row in rows}),
+            'total_records': len(rows),
+            'highest_gameweek_score': max(points) if points else None,
+            'lowest_gameweek_score': min(points) if points else None,
+            'average_gameweek_score': round(sum(points) / len(points), 1) if points else None,
+            'total_transfers': sum(row['transfers'] or 0 for row in rows),
+            'total_transfer_costs': sum(row['transfers_cost'] or 0 for row in rows)
+        }
+
+    def search_players(self, player_name: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Players whose name contains player_name, each with a 'leagues' list of {league_id, league_name},
+        from player_search_mv; falls back to global_players plus one membership query
+        """
+        pattern = f'%{player_name}%'
+        try:
+            response = self.client.table('player_search_mv')\
+                .select('entry_id, player_name, current_team_name, leagues')\
+                .ilike('player_name', pattern)\
+                .limit(limit)\
+                .execute()
+            return response.data or []
+        except Exception as e:
+            log.warning("player_search_mv query failed, joining in Python: %s", e)
+        
+        response = self.client.table('global_players')\
+            .select('entry_id, player_name, current_team_name')\
+            .ilike('player_name', pattern)\
+            .limit(limit)\
+            .execute()
+        players = response.data or []
+        if not players:
+            return []
+        
+        # Leagues of every match in one request instead of one per player
+        memberships = self.client.table('league_memberships')\
+            .select('entry_id, league_id, leagues(name)')\
+            .in_('entry_id', [player['entry_id'] for player in players])\
+            .execute()
+        
+        leagues_by_entry = {}
+        for membership in memberships.data or []:
+            league_info = membership.get('leagues') or {}
+            if isinstance(league_info, list):
+                league_info = league_info[0] if league_info else {}
+            
+            leagues_by_entry.setdefault(membership['entry_id'], []).append({
+                'league_id': membership['league_id'],
+                'league_name': league_info.get('name', f"League {membership['league_id']}")
+            })
+        return [dict(player, leagues=leagues_by_entry.get(player['entry_id'], [])) for player in players]
+
+    def refresh_player_search(self) -> None:
+        """Rebuild player_search_mv after new players/memberships land - service role only (failures only log)"""
+        try:
+            self.admin_client.rpc('refresh_player_search', {}).execute()
+        except Exception as e:
+            log.warning("Could not refresh player_search_mv: %s", e)
+
+    async def get_league_stats_async(self, league_id: int) -> Dict[str, Any]:
+        """get_league_stats over SUPABASE_DB_URL with asyncpg when configured, else PostgREST in a thread"""
+        if SUPABASE_DB_URL:
+            try:
+                pool = await self._get_pg_pool()
+                stats = await pool.fetchval('SELECT league_stats($1)', league_id)
+                if stats:
+                    return orjson.loads(stats)  # asyncpg hands jsonb back as text
+            except Exception as pg_error:
+                log.warning("Direct league_stats query failed, using PostgREST: %s", pg_error)
+        return await asyncio.to_thread(self.get_league_stats, league_id)
+
+    async def _get_pg_pool(self):
+        global _pg_pool
+        async with _pg_pool_lock:
+            if _pg_pool is None:
+                import asyncpg  # optional dependency - only needed when SUPABASE_DB_URL is set
+                # statement_cache_size=0: Supabase's transaction pooler does not keep prepared statements
+                _pg_pool = await asyncpg.create_pool(SUPABASE_DB_URL, min_size=1, max_size=PG_POOL_MAX_SIZE,
+                                                     command_timeout=5, statement_cache_size=0)
+            return _pg_pool
+
+    async def close_pg_pool(self) -> None:
+        global _pg_pool
+        if _pg_pool is not None:
+            await _pg_pool.close()
+            _pg_pool = None
+
+    def get_player_history(self, entry_id: int) -> pd.DataFrame:
+        """One row per gameweek for a player - their numbers are the same in every league they are in"""
         try:
             response = self.client.table('gameweek_data_new')\
-                .select('*, leagues(name), league_memberships(team_name)')\
+                .select(PLAYER_HISTORY_COLUMNS)\
                 .eq('entry_id', entry_id)\
                 .order('gameweek')\
                 .execute()
             
-            if response.data:
-                return pd.DataFrame(response.data)
-            return pd.DataFrame()
+            if not response.data:
+                return pd.DataFrame()
+            
+            return _records_frame(response.data, PLAYER_HISTORY_COLUMNS)\
+                .drop_duplicates('gameweek').reset_index(drop=True)
             
         except Exception as e:
-            print(f"Error getting cross-league stats: {e}")
+            log.error("Error getting player history: %s", e)
             return pd.DataFrame()
 
-    def test_connection(self) -> bool:
-        """Test database connection"""
+    def get_player_cross_league_stats(self, entry_id: int) -> pd.DataFrame:
+        """Get player's performance across all leagues"""
+        return self.get_players_cross_league_stats([entry_id])
+
+    async def get_player_cross_league_stats_async(self, entry_id: int) -> pd.DataFrame:
+        return await self.get_players_cross_league_stats_async([entry_id])
+
+    def get_players_cross_league_stats(self, entry_ids: List[int]) -> pd.DataFrame:
+        """Gameweek rows for several players across all their leagues, with player, league and team names"""
+        cache_key = ('cross_league', tuple(sorted(entry_ids)))
+        cached = _cached_result(cache_key)
+        if cached is not None:
+            return cached
+        
+        try:
+            return _store_result(cache_key, self._merge_cross_league_rows(
+                self._fetch_cross_league_gameweeks(entry_ids),
+                self._fetch_cross_league_players(entry_ids),
+                self._fetch_cross_league_memberships(entry_ids)
+            ))
+        except Exception as e:
+            log.error("Error getting cross-league stats: %s", e)
+            return pd.DataFrame()
+
+    async def get_players_cross_league_stats_async(self, entry_ids: List[int]) -> pd.DataFrame:
+        """Async variant - the three lookups share no data dependency, so they run concurrently"""
+        cache_key = ('cross_league', tuple(sorted(entry_ids)))
+        cached = _cached_result(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
-            response = self.client.table('leagues').select('id').limit(1).execute()
-            print("Supabase connection successful!")
+            gameweek_rows, player_rows, membership_rows = await asyncio.gather(
+                asyncio.to_thread(self._fetch_cross_league_gameweeks, entry_ids),
+                asyncio.to_thread(self._fetch_cross_league_players, entry_ids),
+                asyncio.to_thread(self._fetch_cross_league_memberships, entry_ids)
+            )
+            return _store_result(cache_key, self._merge_cross_league_rows(gameweek_rows, player_rows, membership_rows))
+        except Exception as e:
+            log.error("Error getting cross-league stats: %s", e)
+            return pd.DataFrame()
+
+    def _fetch_cross_league_gameweeks(self, entry_ids: List[int]) -> List[Dict[str, Any]]:
+        response = self.client.table('gameweek_data_new')\
+            .select('entry_id, league_id, gameweek, points, total_points')\
+            .in_('entry_id', entry_ids)\
+            .order('gameweek')\
+            .execute()
+        return response.data or []
+
+    def _fetch_cross_league_players(self, entry_ids: List[int]) -> List[Dict[str, Any]]:
+        response = self.client.table('global_players')\
+            .select('entry_id, player_name')\
+            .in_('entry_id', entry_ids)\
+            .execute()
+        return response.data or []
+
+    def _fetch_cross_league_memberships(self, entry_ids: List[int]) -> List[Dict[str, Any]]:
+        # One membership row per (league, entry), so embedding the league name here is a cheap to-one join
+        response = self.client.table('league_memberships')\
+            .select('entry_id, league_id, team_name, leagues(name)')\
+            .in_('entry_id', entry_ids)\
+            .execute()
+        return response.data or []
+
+    def _merge_cross_league_rows(self, gameweek_rows: List[Dict[str, Any]], player_rows: List[Dict[str, Any]],
+                                 membership_rows: List[Dict[str, Any]]) -> pd.DataFrame:
+        if not gameweek_rows:
+            return pd.DataFrame()
+        
+        memberships = pd.DataFrame(membership_rows, columns=['entry_id', 'league_id', 'team_name', 'leagues'])
+        memberships['league_name'] = [
+            (league[0] if isinstance(league, list) and league else league or {}).get('name')
+            for league in memberships.pop('leagues')
+        ]
+        
+        return pd.DataFrame(gameweek_rows)\
+            .merge(pd.DataFrame(player_rows, columns=['entry_id', 'player_name']), on='entry_id', how='left')\
+            .merge(memberships, on=['entry_id', 'league_id'], how='left')
+
+    def test_connection(self) -> bool:
+        """Test database connection (a success is reused for HEALTH_CACHE_TTL seconds; failures are never cached)"""
+        if _health_cache['value'] and time.time() - _health_cache['ts'] < HEALTH_CACHE_TTL:
             return True
+        
+        try:
+            self.client.table('leagues').select('id').limit(1).execute()
         except Exception as e:
-            print(f"Supabase connection failed: {e}")
+            log.error("Supabase connection failed: %s", e)
+            # Re-probe on the next call so a recovered database is reported straight away
+            _health_cache['value'] = None
             return False
+        log.info("Supabase connection successful!")
+        _health_cache['value'] = True
+        _health_cache['ts'] = time.time()
+        return True
 
 # Initialize database instance
 fpl_db = FPLDatabase()
@@ -663,6 +1478,3 @@ fpl_db = FPLDatabase()
 # Test connection on import
 if __name__ == "__main__":
     fpl_db.test_connection()
-
-# Test that the method exists
-print(f"Method exists: {hasattr(fpl_db, 'get_league_standings_normalized')}")
\ No newline at end of file
@@ -1,200 +1,456 @@
 # fpl_service.py - Improved version with better error handling
 
+import asyncio
+import os
+import numpy as np
 import pandas as pd
-import json
+import orjson
 import requests
-from pandas import json_normalize
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import urllib3
-from typing import Dict, List, Optional, Tuple
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
 from datetime import datetime
+from concurrent.futures import Future, ThreadPoolExecutor
+import threading
 import time
-from database import fpl_db
+import logging
+from database import fpl_db, COPY_MIN_ROWS, UPSERT_BATCH_SIZE
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+log = logging.getLogger(__name__)
+
+# Player history/picks requests in flight at once during league processing - this replaces the
+# old sleep between players as the rate limit towards the FPL API
+FPL_FETCH_CONCURRENCY = int(os.getenv("FPL_FETCH_CONCURRENCY", "8"))
+# Minimum spacing between FPL request starts across all fetch workers; 0 leaves pacing to the pool size
+FPL_MIN_REQUEST_INTERVAL = float(os.getenv("FPL_MIN_REQUEST_INTERVAL", "0"))  # seconds
+# Requests answered within this time let the adaptive in-flight limit grow again
+FPL_TARGET_LATENCY = float(os.getenv("FPL_TARGET_LATENCY", "1.0"))  # seconds
+# Managers fetched per batch - bounds how many payloads are held in memory at once
+FPL_FETCH_BATCH_SIZE = int(os.getenv("FPL_FETCH_BATCH_SIZE", "20"))
+# Gameweek rows handed to the writer pool at once - enough for full upsert batches and the COPY path,
+# while progress is still yielded every FPL_FETCH_BATCH_SIZE managers
+WRITE_BATCH_ROWS = max(UPSERT_BATCH_SIZE, COPY_MIN_ROWS)
+# bootstrap-static (~500 KB) changes about once a gameweek - reuse it across back-to-back league runs
+BOOTSTRAP_CACHE_TTL = int(os.getenv("FPL_BOOTSTRAP_TTL", "300"))  # seconds
+# Formatted standings/summary/captain responses - dropped early by bust_cache when a league is re-ingested.
+# With REDIS_URL set they are also shared between workers for the same TTL
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "60"))  # seconds
+RESPONSE_CACHE_MAX_ENTRIES = 256
+# FPL API bodies kept with their ETag so a repeat GET can be answered by a 304 (oldest dropped first)
+ETAG_CACHE_MAX_ENTRIES = 1024
+
+# Column order unpacked by the response formatters below
+STANDINGS_FIELDS = ['league_position', 'entry_id', 'player_name', 'team_name', 'total_points', 'gameweek_points',
+                    'transfers', 'transfers_cost', 'captain_name', 'vice_captain_name', 'active_chip',
+                    'points_on_bench']
+STANDINGS_INT_FIELDS = ['league_position', 'entry_id', 'total_points', 'gameweek_points', 'transfers',
+                        'transfers_cost', 'points_on_bench']
+STANDINGS_RESPONSE_NAMES = {'league_position': 'position', 'captain_name': 'captain',
+                            'vice_captain_name': 'vice_captain'}
+STANDINGS_RESPONSE_FIELDS = ['position', 'entry_id', 'player_name', 'team_name', 'total_points', 'gameweek_points',
+                             'transfers', 'transfers_cost', 'captain', 'vice_captain', 'active_chip', 'gameweek',
+                             'points_on_bench']
+CAPTAIN_FIELDS = ['captain_id', 'captain_name', 'times_captained', 'total_points', 'average_points',
+                  'best_performance', 'worst_performance']
+# Per-gameweek history fields kept from /entry/{id}/history/ (the flattened row and _gameweek_records use these).
+# All numeric and nullable (rank is null before a gameweek is scored), so one float64 cast replaces inference
+HISTORY_COLUMNS = ['event', 'points', 'total_points', 'rank', 'overall_rank', 'bank', 'value', 'event_transfers',
+                   'event_transfers_cost', 'points_on_bench']
+# Fields of the flattened per-gameweek block: the history columns with pointsnet after points
+FLAT_HISTORY_FIELDS = HISTORY_COLUMNS[:2] + ['pointsnet'] + HISTORY_COLUMNS[2:]
+_POINTS, _VALUE, _TRANSFERS_COST = (HISTORY_COLUMNS.index(column)
+                                    for column in ('points', 'value', 'event_transfers_cost'))
+MANAGER_FIELDS = ['entry_id', 'gameweek', 'gameweek_points', 'total_points', 'captain_name', 'vice_captain_name',
+                  'active_chip', 'transfers_cost', 'team_value', 'points_on_bench', 'player_name', 'team_name']
+MANAGER_INT_FIELDS = ['entry_id', 'gameweek', 'gameweek_points', 'total_points', 'transfers_cost', 'points_on_bench']
+MANAGER_RESPONSE_NAMES = {'player_name': 'fpl_manager', 'captain_name': 'captain',
+                          'vice_captain_name': 'vice_captain'}
+MANAGER_RESPONSE_FIELDS = ['fpl_manager', 'team_name', 'entry_id', 'gameweek', 'total_points', 'gameweek_points',
+                           'captain', 'vice_captain', 'transfers_cost', 'team_value', 'active_chip',
+                           'points_on_bench']
+
+def _with_default(values: pd.Series, default):
+    """Replace missing and empty-string labels with default, keeping None as a real null"""
+    values = values.astype(object)
+    return values.where(values.notna() & (values != ''), default)
+
+class _AdaptiveLimit:
+    """
+    AIMD cap on in-flight FPL requests, between 1 and maximum: grows by `increase` after each
+    success within FPL_TARGET_LATENCY and is multiplied by `decrease` after a throttled or failing one
+    """
+    def __init__(self, maximum: int, increase: float = 0.5, decrease: float = 0.5):
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.limit = float(maximum)
+        self._in_flight = 0
+        self._cond = threading.Condition()
+    
+    def __enter__(self):
+        with self._cond:
+            while self._in_flight >= int(self.limit):
+                self._cond.wait()
+            self._in_flight += 1
+        return self
+    
+    def __exit__(self, *exc_info):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify()
+    
+    def record(self, latency: float, overloaded: bool) -> None:
+        with self._cond:
+            if overloaded:
+                self.limit = max(1.0, self.limit * self.decrease)
+                log.info("FPL API pushing back, in-flight limit now %d", int(self.limit))
+            elif latency <= FPL_TARGET_LATENCY:
+                self.limit = min(float(self.maximum), self.limit + self.increase)
+            self._cond.notify_all()
+
 class FPLService:
     def __init__(self):
         self.base_url = "https://fantasy.premierleague.com/api"
         self.session = requests.Session()
         self.session.verify = False
         self.max_retries = 3
-        self.retry_delay = 1.0
+        self._bootstrap_cache = {'value': None, 'ts': 0.0}
+        self._bootstrap_lock = threading.Lock()
+        self._pace_lock = threading.Lock()
+        self._limit = _AdaptiveLimit(FPL_FETCH_CONCURRENCY)
+        self._next_request_at = 0.0
+        self._response_cache: Dict[Tuple, Tuple[float, int, Dict]] = {}
+        self._etag_cache: Dict[str, Tuple[str, Any]] = {}
+        self._etag_lock = threading.Lock()
+        # Long-lived pools: player fetches and gameweek batch writes reuse the same threads across league runs
+        self._http_pool = ThreadPoolExecutor(max_workers=FPL_FETCH_CONCURRENCY, thread_name_prefix='fpl-http')
+        self._db_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='fpl-db')
+        self.session.headers.update({'User-Agent': 'fpl-backend/1.0'})
+        self.session.mount('https://', HTTPAdapter(
+            # One kept-alive connection per fetch worker so the player fan-out reuses its TLS sessions
+            pool_connections=1,
+            pool_maxsize=FPL_FETCH_CONCURRENCY,
+            # Exponential backoff (0.5s, 1s, 2s) on connection errors and retryable statuses, GETs only
+            max_retries=Retry(total=self.max_retries, backoff_factor=0.5,
+                              status_forcelist=(429, 500, 502, 503, 504),
+                              allowed_methods=frozenset(['GET']), raise_on_status=False)
+        ))
         
-    def get_current_gameweek(self) -> int:
-        """Get current gameweek number from FPL API with retries"""
-        for attempt in range(self.max_retries):
+    def close(self) -> None:
+        """Finish queued fetches/writes and release the worker pools and HTTP session"""
+        self._http_pool.shutdown(wait=True)
+        self._db_pool.shutdown(wait=True)
+        self.session.close()
+    
+    def _pace(self) -> None:
+        """Space request starts at least FPL_MIN_REQUEST_INTERVAL apart - a shared limiter, not a per-player sleep"""
+        if FPL_MIN_REQUEST_INTERVAL <= 0:
+            return
+        with self._pace_lock:
+            now = time.monotonic()
+            delay = self._next_request_at - now
+            self._next_request_at = max(now, self._next_request_at) + FPL_MIN_REQUEST_INTERVAL
+        if delay > 0:
+            time.sleep(delay)
+    
+    def _get_json(self, path: str, timeout: float = 10) -> Any:
+        """
+        GET an FPL API path and decode it; transient failures are retried by the session adapter.
+        Revalidates with If-None-Match when an earlier response carried an ETag
+        """
+        cached = self._etag_cache.get(path)
+        headers = {'If-None-Match': cached[0]} if cached else None
+        self._pace()
+        with self._limit:
+            started = time.monotonic()
             try:
-                response = self.session.get(f'{self.base_url}/bootstrap-static/', timeout=10)
-                response.raise_for_status()
-                fplurl = response.json()
-                fplgw = json_normalize(fplurl['events'])
-                
-                for i in range(len(fplgw)):
-                    if fplgw.is_current[i]:
-                        current_gw = int(fplgw.id[i])
-                        return current_gw
-                return 1
-            except Exception as e:
-                print(f"Attempt {attempt + 1} failed: {e}")
-                if attempt < self.max_retries - 1:
-                    time.sleep(self.retry_delay * (attempt + 1))
-                else:
-                    print(f"All attempts failed, using fallback")
-                    return fpl_db.get_current_gameweek() or 1
+                response = self.session.get(f'{self.base_url}{path}', timeout=timeout, headers=headers)
+            except requests.RequestException:
+                self._limit.record(time.monotonic() - started, overloaded=True)
+                raise
+            self._limit.record(time.monotonic() - started, overloaded=self._overloaded(response))
+        if response.status_code == 304 and cached:
+            return cached[1]  # unchanged since the last fetch - no body sent, nothing to decode
+        response.raise_for_status()
+        # orjson decodes the raw bytes several times faster than response.json() (stdlib json)
+        data = orjson.loads(response.content)
+        etag = response.headers.get('ETag')
+        if etag:
+            with self._etag_lock:  # fetches run on the fpl-http pool
+                if path not in self._etag_cache and len(self._etag_cache) >= ETAG_CACHE_MAX_ENTRIES:
+                    self._etag_cache.pop(next(iter(self._etag_cache)), None)  # evict the oldest insert
+                self._etag_cache[path] = (etag, data)
+        return data
+    
+    @staticmethod
+    def _overloaded(response: requests.Response) -> bool:
+        """429/5xx or connection errors on the final response or any attempt the retry adapter absorbed"""
+        retries = getattr(response.raw, 'retries', None)
+        attempts = getattr(retries, 'history', ()) or ()
+        if any(attempt.error is not None or (attempt.status or 0) == 429 or (attempt.status or 0) >= 500
+               for attempt in attempts):
+            return True
+        return response.status_code == 429 or response.status_code >= 500
+    
+    def _bootstrap(self) -> Dict:
+        """bootstrap-static payload, refetched once BOOTSTRAP_CACHE_TTL has passed (one download under concurrent callers)"""
+        with self._bootstrap_lock:
+            if self._bootstrap_cache['value'] is None or time.time() - self._bootstrap_cache['ts'] >= BOOTSTRAP_CACHE_TTL:
+                # Same disk-cached copy update_current_gameweek reads, so one download serves a whole league run
+                self._bootstrap_cache = {'value': fpl_db.get_bootstrap_static(), 'ts': time.time()}
+            return self._bootstrap_cache['value']
+    
+    def get_current_gameweek(self) -> int:
+        """Get current gameweek number from FPL API, falling back to the stored value"""
+        try:
+            fplurl = self._bootstrap()
+            # Only the is_current flag is needed - no point building a DataFrame of every event
+            return next((int(event['id']) for event in fplurl['events'] if event.get('is_current')), 1)
+        except Exception as e:
+            log.error("Failed to get current gameweek, using fallback: %s", e)
+            return fpl_db.get_current_gameweek() or 1
     
     def get_league_info(self, league_id: int) -> Dict:
-        """Get league information and standings with retries"""
-        for attempt in range(self.max_retries):
-            try:
-                response = self.session.get(f'{self.base_url}/leagues-classic/{league_id}/standings/', timeout=15)
-                response.raise_for_status()
-                league_data = response.json()
-                return league_data
-            except Exception as e:
-                print(f"League info attempt {attempt + 1} failed: {e}")
-                if attempt < self.max_retries - 1:
-                    time.sleep(self.retry_delay * (attempt + 1))
-                else:
-                    print(f"Failed to get league {league_id} after {self.max_retries} attempts")
-                    return {}
+        """Get league information and standings"""
+        try:
+            return self._get_json(f'/leagues-classic/{league_id}/standings/', timeout=15)
+        except Exception as e:
+            log.error("Failed to get league %s: %s", league_id, e)
+            return {}
     
     def get_footballers_data(self) -> pd.DataFrame:
-        """Get all FPL players data with retries"""
-        for attempt in range(self.max_retries):
-            try:
-                response = self.session.get(f'{self.base_url}/bootstrap-static/', timeout=15)
-                response.raise_for_status()
-                bootstrap_data = response.json()
-                return pd.DataFrame.from_records(bootstrap_data['elements'])
-            except Exception as e:
-                print(f"Footballers data attempt {attempt + 1} failed: {e}")
-                if attempt < self.max_retries - 1:
-                    time.sleep(self.retry_delay * (attempt + 1))
-                else:
-                    return pd.DataFrame()
+        """Get all FPL players data"""
+        try:
+            return pd.DataFrame.from_records(self._bootstrap()['elements'])
+        except Exception as e:
+            log.error("Failed to get footballers data: %s", e)
+            return pd.DataFrame()
+    
+    def get_footballers_web_names(self) -> Dict[int, str]:
+        """Footballer id -> web_name, read straight off the bootstrap elements"""
+        try:
+            return {int(element['id']): element['web_name'] for element in self._bootstrap()['elements']}
+        except Exception as e:
+            log.error("Failed to get footballers web names: %s", e)
+            return {}
     
     def get_player_history(self, entry_id: int) -> Dict:
-        """Get player's full history with retries"""
-        for attempt in range(self.max_retries):
-            try:
-                response = self.session.get(f'{self.base_url}/entry/{entry_id}/history/', timeout=10)
-                response.raise_for_status()
-                return response.json()
-            except Exception as e:
-                if attempt < self.max_retries - 1:
-                    time.sleep(self.retry_delay)
-                else:
-                    print(f"Failed to get player {entry_id} history after {self.max_retries} attempts: {e}")
-                    return {}
+        """Get player's full history"""
+        try:
+            return self._get_json(f'/entry/{entry_id}/history/')
+        except Exception as e:
+            log.error("Failed to get player %s history: %s", entry_id, e)
+            return {}
     
     def get_player_gameweek_picks(self, entry_id: int, gameweek: int) -> Dict:
-        """Get player's picks for specific gameweek with retries"""
-        for attempt in range(self.max_retries):
-            try:
-                response = self.session.get(f'{self.base_url}/entry/{entry_id}/event/{gameweek}/picks/', timeout=10)
-                response.raise_for_status()
-                return response.json()
-            except Exception as e:
-                if attempt < self.max_retries - 1:
-                    time.sleep(self.retry_delay)
-                else:
-                    print(f"Failed to get player {entry_id} GW {gameweek} picks: {e}")
-                    return {}
+        """Get player's picks for specific gameweek"""
+        try:
+            return self._get_json(f'/entry/{entry_id}/event/{gameweek}/picks/')
+        except Exception as e:
+            log.error("Failed to get player %s GW %s picks: %s", entry_id, gameweek, e)
+            return {}
+    
+    @staticmethod
+    def _picks_summary(payload: Dict) -> Dict:
+        """The parts of a picks payload the ingest reads - fixed once the gameweek deadline has passed"""
+        return {
+            'picks': [{'element': pick.get('element'), 'is_captain': pick.get('is_captain'),
+                       'is_vice_captain': pick.get('is_vice_captain')} for pick in payload.get('picks', [])],
+            'active_chip': payload.get('active_chip')
+        }
+    
+    def _iter_player_payloads(self, entry_ids: List[int], gameweek: int,
+                              store_in_db: bool = True) -> Iterator[Tuple[int, Dict, Dict]]:
+        """
+        Yield (entry_id, history, picks) in entry_ids order, fetched concurrently in batches of
+        FPL_FETCH_BATCH_SIZE. The next batch is already in flight while the caller transforms the
+        current one. Failed fetches come back as {}.
+        Picks already in picks_cache are not refetched; the gameweek passed in is the current one, whose
+        deadline has passed, so newly fetched picks are cached once the last manager has been yielded
+        (unless store_in_db is False - a dry run writes nothing).
+        """
+        batches = [entry_ids[i:i + FPL_FETCH_BATCH_SIZE] for i in range(0, len(entry_ids), FPL_FETCH_BATCH_SIZE)]
+        cached_picks = fpl_db.get_cached_picks(entry_ids, gameweek)
+        fetched_picks = {}
+        
+        pool = self._http_pool
+        
+        def submit(batch: List[int]) -> List[Tuple[int, Future, Any]]:
+            return [(entry_id, pool.submit(self.get_player_history, entry_id),
+                     cached_picks.get(entry_id) or pool.submit(self.get_player_gameweek_picks, entry_id, gameweek))
+                    for entry_id in batch]
+        
+        pending = submit(batches[0]) if batches else []
+        for next_batch in batches[1:] + [[]]:
+            current, pending = pending, submit(next_batch)
+            for entry_id, history, picks in current:
+                if isinstance(picks, Future):
+                    picks = picks.result()
+                    if picks.get('picks'):
+                        fetched_picks[entry_id] = self._picks_summary(picks)
+                yield entry_id, history.result(), picks
+        
+        if store_in_db:
+            fpl_db.store_picks(gameweek, fetched_picks)
     
     def process_league_data_normalized(self, league_id: int, store_in_db: bool = True) -> Tuple[pd.DataFrame, pd.DataFrame]:
         """
         Process league data using normalized schema with PROPER ordering and error handling
         """
-        print(f"Processing league {league_id} with normalized schema...")
+        batches = list(self.iter_league_batches(league_id, store_in_db))
+        
+        dfresults = pd.concat([gameweek_df for gameweek_df, _ in batches], ignore_index=True) \
+            if batches else pd.DataFrame()
+        chip_frames = [chips_df for _, chips_df in batches if not chips_df.empty]
+        dfresultschips = pd.concat(chip_frames, ignore_index=True) if chip_frames else pd.DataFrame()
+        
+        log.info("Processing complete! Processed %d player records", len(dfresults))
+        return dfresults, dfresultschips
+    
+    async def iter_league_results(self, league_id: int,
+                                  store_in_db: bool = True) -> AsyncIterator[Tuple[pd.DataFrame, pd.DataFrame]]:
+        """
+        Async view of iter_league_batches. The ingest runs to completion in its own thread even if the
+        consumer stops early (a streaming client disconnects), so the final writes, bust_cache, the
+        search refresh and the picks cache always happen; batches nobody reads are dropped
+        """
+        loop = asyncio.get_running_loop()
+        results: asyncio.Queue = asyncio.Queue()
+        
+        def publish(item: Optional[Tuple[pd.DataFrame, pd.DataFrame]]) -> None:
+            try:
+                loop.call_soon_threadsafe(results.put_nowait, item)
+            except RuntimeError:
+                pass  # event loop already closed - keep ingesting, there is just no one to tell
         
-        dfresults = pd.DataFrame()
-        dfresultschips = pd.DataFrame()
+        def run() -> None:
+            try:
+                for batch in self.iter_league_batches(league_id, store_in_db):
+                    publish(batch)
+            finally:
+                publish(None)
+        
+        threading.Thread(target=run, name=f'fpl-ingest-{league_id}').start()
+        while True:
+            batch = await results.get()
+            if batch is None:
+                return
+            yield batch
+    
+    def iter_league_batches(self, league_id: int, store_in_db: bool = True) -> Iterator[Tuple[pd.DataFrame, pd.DataFrame]]:
+        """
+        Process a league and yield (gameweek_df, chips_df) for every FPL_FETCH_BATCH_SIZE managers as soon as
+        that batch is transformed; when storing, the batch's DB write is queued at the same time
+        """
+        log.info("Processing league %s with normalized schema...", league_id)
         
         try:
             # Step 1: Update current gameweek
             fpl_db.update_current_gameweek()
             current_gw = fpl_db.get_current_gameweek()
-            print(f"Current gameweek: {current_gw}")
+            log.info("Current gameweek: %s", current_gw)
             
             # Step 2: Get league data
             league_data = self.get_league_info(league_id)
             if not league_data or 'standings' not in league_data:
-                print("❌ No league data found")
-                return dfresults, dfresultschips
+                log.error("No league data found")
+                return
             
             # Step 3: Store league info FIRST
             if store_in_db:
                 league_name = league_data.get('league', {}).get('name', f'League {league_id}')
                 league_success = fpl_db.store_league_info(league_id, league_name)
-                print(f"League info stored: {'✅' if league_success else '❌'} - {league_name}")
+                log.info("League info stored: %s - %s", league_success, league_name)
             
             # Step 4: Process league standings
             dfleague = pd.DataFrame.from_records(league_data['standings']['results'])
             number_players = len(dfleague.index)
-            print(f"Found {number_players} players in league")
+            log.info("Found %d players in league", number_players)
             
             if number_players == 0:
-                print("❌ No players found in league")
-                return dfresults, dfresultschips
+                log.error("No players found in league")
+                return
             
             # Step 5: CRITICAL - Store global players FIRST (they must exist before foreign key references)
             if store_in_db:
-                print("🔄 Step 1/4: Storing global players (required for foreign keys)...")
+                log.info("Step 1/4: Storing global players (required for foreign keys)...")
                 players_success = fpl_db.store_global_players(dfleague)
-                print(f"Global players stored: {'✅' if players_success else '❌'}")
+                log.info("Global players stored: %s", players_success)
                 
                 if not players_success:
-                    print("❌ CRITICAL: Failed to store global players - cannot proceed with gameweek data")
-                    return dfresults, dfresultschips
+                    log.error("CRITICAL: Failed to store global players - cannot proceed with gameweek data")
+                    return
                 
-                # Step 6: Store league memberships (depends on global_players)
-                print("🔄 Step 2/4: Storing league memberships...")
-                memberships_success = fpl_db.store_league_memberships(league_id, dfleague)
-                print(f"League memberships stored: {'✅' if memberships_success else '❌'}")
+                # Step 6: Store league memberships (depends on global_players) - queued so the write
+                # overlaps the footballers fetch/store below, which shares no rows with it
+                log.info("Step 2/4: Storing league memberships...")
+                memberships_future = self._db_pool.submit(fpl_db.store_league_memberships, league_id, dfleague)
             
             # Step 7: Get and store footballers data (independent, can be done anytime)
-            print("🔄 Step 3/4: Getting FPL footballers data...")
-            dffootballers = self.get_footballers_data()
-            if dffootballers.empty:
-                print("⚠️  Warning: Could not get footballers data - captain names may be missing")
+            log.info("Step 3/4: Getting FPL footballers data...")
+            # Footballer id -> web_name for captain names; the frame is only built when it gets stored
+            web_names = self.get_footballers_web_names()
+            if not web_names:
+                log.warning("Could not get footballers data - captain names may be missing")
                 # Don't return here - we can still process without captain names
             
-            if store_in_db and not dffootballers.empty:
-                footballers_success = fpl_db.store_fpl_footballers(dffootballers)
-                print(f"FPL footballers stored: {'✅' if footballers_success else '❌'}")
+            if store_in_db and web_names:
+                footballers_success = fpl_db.store_fpl_footballers(self.get_footballers_data())
+                log.info("FPL footballers stored: %s", footballers_success)
+            
+            if store_in_db:
+                log.info("League memberships stored: %s", memberships_future.result())
             
             # Step 8: Process each player's gameweek data (AFTER players are stored)
-            print("🔄 Step 4/4: Processing individual player gameweek data...")
+            log.info("Step 4/4: Processing individual player gameweek data...")
             
             successful_players = 0
             failed_players = 0
+            # History length -> flattened column names; nearly every manager has the same length,
+            # so the names are formatted once per run instead of once per manager
+            flat_columns_by_length = {}
+            # Collected per player and concatenated once per batch - concat inside the loop recopies every earlier row
+            player_frames = []
+            chip_frames = []
+            # Yielded batches waiting to be written together - see WRITE_BATCH_ROWS
+            pending_writes = []
+            write_futures = []
+            
+            payloads = self._iter_player_payloads(dfleague.entry.tolist(), current_gw, store_in_db)
+            league_rows = dfleague[['entry', 'player_name', 'entry_name', 'total']].itertuples(index=False)
             
-            for j in range(number_players):
-                entry_id = dfleague.entry[j]
-                player_name = dfleague.player_name[j]
-                print(f"Processing player {j+1}/{number_players}: {player_name} (ID: {entry_id})")
+            # payloads first so zip runs the generator to completion (it caches the new picks on exit)
+            for j, ((entry_id, player_json, player_gw_json), manager) in enumerate(zip(payloads, league_rows)):
+                player_name = manager.player_name
+                log.debug("Processing player %d/%d: %s (ID: %s)", j + 1, number_players, player_name, entry_id)
+                
+                if len(player_frames) >= FPL_FETCH_BATCH_SIZE:
+                    yield self._finish_batch(player_frames, chip_frames, store_in_db, pending_writes, write_futures)
+                    player_frames, chip_frames = [], []
                 
                 try:
-                    # Get player history
-                    player_json = self.get_player_history(entry_id)
                     if not player_json or 'current' not in player_json:
-                        print(f"⚠️  Warning: No data for player {player_name}")
+                        log.warning("No data for player %s", player_name)
                         failed_players += 1
                         continue
                     
-                    # Process current season data
-                    dfplayer = pd.DataFrame.from_records(player_json['current'])
-                    if dfplayer.empty:
+                    # Process current season data straight into a float array (None -> NaN) - no per-player DataFrame
+                    history = player_json['current']
+                    if not history:
                         failed_players += 1
                         continue
 
-                    print(f"Available columns for player {player_name}: {list(dfplayer.columns)}")
-                    print(f"Sample row: {dfplayer.iloc[0] if not dfplayer.empty else 'No data'}")
+                    if log.isEnabledFor(logging.DEBUG):
+                        log.debug("Sample history row for player %s: %s", player_name, history[0])
                     
+                    values = np.array([[gameweek.get(column) for column in HISTORY_COLUMNS] for gameweek in history],
+                                      dtype=np.float64)
+                    values[:, _VALUE] /= 10
                     # Calculate points net
-                    points_net = dfplayer['points'] - dfplayer['event_transfers_cost']
-                    dfplayer.insert(2, 'pointsnet', points_net, True)
-                    dfplayer['value'] = dfplayer['value'] / 10
+                    values = np.insert(values, 2, values[:, _POINTS] - values[:, _TRANSFERS_COST], axis=1)
                     
                     # Get captain & vice-captain with IDs
                     captain_id = None
@@ -204,45 +460,33 @@ class FPLService:
                     active_chip = None
                     
                     try:
-                        player_gw_json = self.get_player_gameweek_picks(entry_id, current_gw)
                         if player_gw_json and 'picks' in player_gw_json:
-                            dfplayergw = pd.DataFrame.from_records(player_gw_json['picks'])
+                            # 15 plain dicts - scanning them beats building a DataFrame per manager
+                            picks = player_gw_json['picks']
+                            captain_id = next((int(pick['element']) for pick in picks if pick.get('is_captain')), None)
+                            vice_captain_id = next((int(pick['element']) for pick in picks
+                                                    if pick.get('is_vice_captain')), None)
+                            captain_name = web_names.get(captain_id, captain_name)
+                            vice_captain_name = web_names.get(vice_captain_id, vice_captain_name)
                             
-                            if not dfplayergw.empty:
-                                captain_picks = dfplayergw[dfplayergw.is_captain == True]
-                                vice_captain_picks = dfplayergw[dfplayergw.is_vice_captain == True]
-                                
-                                if not captain_picks.empty:
-                                    captain_id = int(captain_picks.element.iloc[0])
-                                    if not dffootballers.empty:
-                                        captain_row = dffootballers[dffootballers.id == captain_id]
-                                        if not captain_row.empty:
-                                            captain_name = captain_row.web_name.item()
-                                
-                                if not vice_captain_picks.empty:
-                                    vice_captain_id = int(vice_captain_picks.element.iloc[0])
-                                    if not dffootballers.empty:
-                                        vice_captain_row = dffootballers[dffootballers.id == vice_captain_id]
-                                        if not vice_captain_row.empty:
-                                            vice_captain_name = vice_captain_row.web_name.item()
-                                
-                                if 'active_chip' in player_gw_json:
-                                    active_chip = player_gw_json['active_chip']
+                            if picks and 'active_chip' in player_gw_json:
+                                active_chip = player_gw_json['active_chip']
                         
                     except Exception as picks_error:
-                        print(f"⚠️  Warning: Could not get picks for {player_name}: {picks_error}")
+                        log.warning("Could not get picks for %s: %s", player_name, picks_error)
                     
-                    # Transform DataFrame to single row
-                    dfplayer.index = dfplayer.index + 1
-                    dfplayer_out = dfplayer.stack()
-                    dfplayer_out.index = dfplayer_out.index.map('{0[1]}_{0[0]}'.format)
-                    dfplayer = dfplayer_out.to_frame().T
+                    # Transform to a single row: field c of history row i becomes c_i (1-based), in row-major order
+                    flat_columns = flat_columns_by_length.get(len(history))
+                    if flat_columns is None:
+                        flat_columns = flat_columns_by_length[len(history)] = \
+                            [f"{field}_{row}" for row in range(1, len(history) + 1) for field in FLAT_HISTORY_FIELDS]
+                    dfplayer = pd.DataFrame(values.reshape(1, -1), columns=flat_columns)
                     
                     # Add player info
-                    dfplayer.insert(0, 'Player Name', dfleague.player_name[j], True)
-                    dfplayer.insert(1, 'Team Name', dfleague.entry_name[j], True)
-                    dfplayer.insert(2, 'Player Entry', dfleague.entry[j], True)
-                    dfplayer.insert(3, 'Player Points', dfleague.total[j], True)
+                    dfplayer.insert(0, 'Player Name', manager.player_name, True)
+                    dfplayer.insert(1, 'Team Name', manager.entry_name, True)
+                    dfplayer.insert(2, 'Player Entry', manager.entry, True)
+                    dfplayer.insert(3, 'Player Points', manager.total, True)
                     
                     # Add captain info with IDs
                     dfplayer['Captain'] = captain_name
@@ -253,105 +497,210 @@ class FPLService:
                     dfplayer['league_id'] = league_id
                     dfplayer['gameweek'] = current_gw
                     
-                    # Update results DataFrame
-                    dfresults = pd.concat([dfresults, dfplayer], ignore_index=True)
+                    player_frames.append(dfplayer)
                     successful_players += 1
                     
                     # Process chips
                     if 'chips' in player_json:
                         dfplayerchips = pd.DataFrame.from_records(player_json['chips'])
                         if not dfplayerchips.empty:
-                            dfplayerchips.insert(0, 'Player Name', dfleague.player_name[j], True)
-                            dfplayerchips.insert(1, 'Player Points', dfleague.total[j], True)
+                            dfplayerchips.insert(0, 'Player Name', manager.player_name, True)
+                            dfplayerchips.insert(1, 'Player Points', manager.total, True)
                             dfplayerchips['league_id'] = league_id
                             dfplayerchips['entry_id'] = entry_id
                             
-                            dfresultschips = pd.concat([dfresultschips, dfplayerchips], ignore_index=True)
-                    
-                    # Rate limiting
-                    time.sleep(0.1)
+                            chip_frames.append(dfplayerchips)
                     
                 except Exception as player_error:
-                    print(f"❌ Error processing player {player_name}: {player_error}")
+                    log.error("Error processing player %s: %s", player_name, player_error, exc_info=True)
                     failed_players += 1
                     continue
             
-            print(f"Player processing complete: ✅ {successful_players} success, ❌ {failed_players} failed")
+            if player_frames:
+                yield self._finish_batch(player_frames, chip_frames, store_in_db, pending_writes, write_futures)
+            self._queue_writes(pending_writes, write_futures)
+            log.info("Player processing complete: %d success, %d failed", successful_players, failed_players)
             
-            # Step 9: Store gameweek data ONLY AFTER all players are confirmed in global_players
-            if store_in_db and not dfresults.empty:
-                print(f"🔄 Storing {len(dfresults)} gameweek records...")
-                gameweek_success = fpl_db.store_gameweek_data_normalized(dfresults)
-                print(f"Gameweek data stored: {'✅' if gameweek_success else '❌'}")
-                
-                if not dfresultschips.empty:
-                    print(f"🔄 Storing {len(dfresultschips)} chip records...")
-                    chip_success = fpl_db.store_chip_usage_normalized(dfresultschips)
-                    print(f"Chip data stored: {'✅' if chip_success else '❌'}")
-            
-            print(f"✅ Processing complete! Processed {len(dfresults)} player records")
-            return dfresults, dfresultschips
+            # Step 9: Gameweek data is written batch by batch (players were stored in step 1);
+            # wait for every batch before reporting
+            if write_futures:
+                results = [future.result() for future in write_futures]
+                self.bust_cache(league_id)
+                fpl_db.refresh_player_search()  # picks up this league's players and memberships
+                log.info("Gameweek data stored: %s, chip data stored: %s",
+                         all(gameweek_ok for gameweek_ok, _ in results), all(chip_ok for _, chip_ok in results))
             
         except Exception as e:
-            print(f"❌ CRITICAL ERROR in process_league_data_normalized for league {league_id}: {e}")
-            import traceback
-            print(f"Full traceback: {traceback.format_exc()}")
-            return dfresults, dfresultschips
+            log.exception("CRITICAL ERROR in process_league_data_normalized for league %s: %s", league_id, e)
+    
+    def _finish_batch(self, player_frames: List[pd.DataFrame], chip_frames: List[pd.DataFrame], store_in_db: bool,
+                      pending_writes: List[Tuple[pd.DataFrame, pd.DataFrame]],
+                      write_futures: List[Future]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Concatenate one batch of manager frames; when storing, hold it for the next write and queue that
+        write on the DB writer pool once WRITE_BATCH_ROWS rows are pending
+        """
+        gameweek_df = pd.concat(player_frames, ignore_index=True)
+        chips_df = pd.concat(chip_frames, ignore_index=True) if chip_frames else pd.DataFrame()
+        if store_in_db:
+            pending_writes.append((gameweek_df, chips_df))
+            if sum(len(pending_gameweeks) for pending_gameweeks, _ in pending_writes) >= WRITE_BATCH_ROWS:
+                self._queue_writes(pending_writes, write_futures)
+        return gameweek_df, chips_df
+    
+    def _queue_writes(self, pending_writes: List[Tuple[pd.DataFrame, pd.DataFrame]],
+                      write_futures: List[Future]) -> None:
+        """Submit every pending batch as one store_gameweek_with_chips call and clear the pending list"""
+        if not pending_writes:
+            return
+        gameweek_df = pd.concat([gameweeks for gameweeks, _ in pending_writes], ignore_index=True)
+        chip_frames = [chips for _, chips in pending_writes if not chips.empty]
+        chips_df = pd.concat(chip_frames, ignore_index=True) if chip_frames else pd.DataFrame()
+        pending_writes.clear()
+        log.info("Storing %d gameweek records and %d chip records...", len(gameweek_df), len(chips_df))
+        write_futures.append(self._db_pool.submit(fpl_db.store_gameweek_with_chips, gameweek_df, chips_df))
+    
+    def _cached_response(self, key: Tuple) -> Optional[Dict]:
+        # Entries built before the league's latest write (on any worker) no longer match its generation
+        generation = fpl_db.data_generation(key[1])
+        cached = self._response_cache.get(key)
+        if cached and time.time() - cached[0] < RESPONSE_CACHE_TTL and cached[1] == generation:
+            return cached[2]
+        # Another worker may have formatted it already (no-op without REDIS_URL)
+        return fpl_db.get_shared_response(self._shared_key(key, generation))
+    
+    def _store_response(self, key: Tuple, response: Dict) -> Dict:
+        # Errors and "no data yet" responses are not cached so the next request retries
+        if "error" not in response and "message" not in response:
+            generation = fpl_db.data_generation(key[1])
+            if len(self._response_cache) >= RESPONSE_CACHE_MAX_ENTRIES:
+                self._response_cache.pop(next(iter(self._response_cache)), None)  # evict the oldest insert
+            self._response_cache[key] = (time.time(), generation, response)
+            fpl_db.set_shared_response(self._shared_key(key, generation), response, RESPONSE_CACHE_TTL)
+        return response
+    
+    @staticmethod
+    def _shared_key(key: Tuple, generation: int) -> str:
+        # League id leads so bust_cache can drop a league's keys by prefix
+        return f"resp:{key[1]}:g{generation}:{':'.join(map(str, key[:1] + key[2:]))}"
     
-    def get_league_standings_from_db_normalized(self, league_id: int, gameweek: Optional[int] = None) -> Dict:
+    def bust_cache(self, league_id: int) -> None:
+        """Retire cached standings/summary/captain responses for a league on every worker after new data is written"""
+        fpl_db.bump_data_generation({league_id})
+        for key in list(self._response_cache):
+            if key[1] == league_id:
+                self._response_cache.pop(key, None)
+        fpl_db.delete_shared_responses(f"resp:{league_id}:")
+    
+    def get_league_standings_from_db_normalized(self, league_id: int, gameweek: Optional[int] = None,
+                                                limit: Optional[int] = None, offset: int = 0) -> Dict:
         """Get league standings with smart gameweek selection"""
+        cache_key = ('standings', league_id, gameweek, limit, offset)
+        cached = self._cached_response(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
-            df = fpl_db.get_league_standings_normalized(league_id, gameweek)
-            if df.empty:
-                return {"standings": [], "message": "No data found - try running data collection first"}
-            
-            # DEBUG: See what's in the DataFrame
-            print(f"DataFrame columns: {list(df.columns)}")
-            if not df.empty:
-                print(f"Sample transfers data: transfers={df.iloc[0].get('transfers')}, transfers_cost={df.iloc[0].get('transfers_cost')}")
-            
-            standings = []
-            selected_gameweek = df['selected_gameweek'].iloc[0] if 'selected_gameweek' in df.columns else gameweek
+            df = fpl_db.get_league_standings_normalized(league_id, gameweek, limit, offset)
+            return self._store_response(cache_key, self._format_league_standings(df, league_id, gameweek))
+        except Exception as e:
+            log.exception("Error getting normalized league standings: %s", e)
+            return {"error": str(e), "standings": []}
+    
+    async def get_league_standings_from_db_normalized_async(self, league_id: int, gameweek: Optional[int] = None,
+                                                            limit: Optional[int] = None, offset: int = 0) -> Dict:
+        """Async variant of get_league_standings_from_db_normalized for FastAPI endpoints"""
+        cache_key = ('standings', league_id, gameweek, limit, offset)
+        cached = self._cached_response(cache_key)
+        if cached is not None:
+            return cached
+        
+        try:
+            df = await fpl_db.get_league_standings_normalized_async(league_id, gameweek, limit, offset)
+            return self._store_response(cache_key, self._format_league_standings(df, league_id, gameweek))
+        except Exception as e:
+            log.exception("Error getting normalized league standings: %s", e)
+            return {"error": str(e), "standings": []}
+    
+    def _format_league_standings(self, df: pd.DataFrame, league_id: int, gameweek: Optional[int] = None) -> Dict:
+        """Shape a standings DataFrame into the API response"""
+        if df.empty:
+            return {"standings": [], "message": "No data found - try running data collection first"}
+        
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("DataFrame columns: %s", list(df.columns))
+            log.debug("Sample transfers data: transfers=%s, transfers_cost=%s",
+                      df.iloc[0].get('transfers'), df.iloc[0].get('transfers_cost'))
+        
+        selected_gameweek = df['selected_gameweek'].iloc[0] if 'selected_gameweek' in df.columns else gameweek
+        gameweek_value = int(selected_gameweek) if pd.notna(selected_gameweek) else 0
+        
+        # Missing columns are materialised once, then every field is filled and cast column-wise
+        frame = df.reindex(columns=STANDINGS_FIELDS)
+        if 'league_position' not in df.columns:
+            # Only frames built without the view's rank get positions from their (already ranked) row order
+            frame['league_position'] = np.arange(1, len(frame) + 1)
+        frame[STANDINGS_INT_FIELDS] = frame[STANDINGS_INT_FIELDS].fillna(0).astype('int64')
+        frame['player_name'] = frame['player_name'].fillna('Unknown Player').astype(str)
+        frame['team_name'] = frame['team_name'].fillna('Unknown Team').astype(str)
+        for column, default in (('captain_name', 'No Captain'), ('vice_captain_name', 'No Vice Captain'),
+                                ('active_chip', None)):
+            frame[column] = _with_default(frame[column], default)
+        frame['gameweek'] = gameweek_value
+        
+        standings = frame.rename(columns=STANDINGS_RESPONSE_NAMES)[STANDINGS_RESPONSE_FIELDS].to_dict('records')
+        
+        return {
+            "league_id": int(league_id),
+            "gameweek": int(selected_gameweek) if pd.notna(selected_gameweek) else "latest",
+            "total_players": len(standings),
+            "standings": standings,
+            "last_updated": datetime.now().isoformat()
+        }
+    
+    async def get_league_summary_from_db_async(self, league_id: int) -> Dict:
+        """League info plus current standings and headline numbers"""
+        cache_key = ('summary', league_id)
+        cached = self._cached_response(cache_key)
+        if cached is not None:
+            return cached
+        
+        try:
+            summary = await fpl_db.get_league_summary_async(league_id)
             
-            for _, row in df.iterrows():
-                player_name = str(row.get('player_name', 'Unknown Player'))
-                team_name = str(row.get('team_name', 'Unknown Team'))
-                
-                standings.append({
-                    "position": int(row.get('league_position', len(standings) + 1)) if pd.notna(row.get('league_position')) else len(standings) + 1,
-                    "entry_id": int(row.get('entry_id', 0)) if pd.notna(row.get('entry_id')) else 0,
-                    "player_name": player_name,
-                    "team_name": team_name,
-                    "total_points": int(row.get('total_points', 0)) if pd.notna(row.get('total_points')) else 0,
-                    "gameweek_points": int(row.get('gameweek_points', 0)) if pd.notna(row.get('gameweek_points')) else 0,
-                    "transfers": int(row.get('transfers', 0)) if pd.notna(row.get('transfers')) else 0,  # THIS IS THE MISSING LINE
-                    "transfers_cost": int(row.get('transfers_cost', 0)) if pd.notna(row.get('transfers_cost')) else 0,
-                    "captain": str(row.get('captain_name', '')) if pd.notna(row.get('captain_name')) and row.get('captain_name') else 'No Captain',
-                    "vice_captain": str(row.get('vice_captain_name', '')) if pd.notna(row.get('vice_captain_name')) and row.get('vice_captain_name') else 'No Vice Captain',
-                    "active_chip": str(row.get('active_chip', '')) if pd.notna(row.get('active_chip')) and row.get('active_chip') else None,
-                    "gameweek": int(selected_gameweek) if pd.notna(selected_gameweek) else 0,
-                    "points_on_bench": int(row.get('points_on_bench', 0)) if pd.notna(row.get('points_on_bench')) else 0
-                })
+            league_info = summary['league_info']
+            if not league_info:
+                return {"error": f"League {league_id} not found"}
             
-            standings.sort(key=lambda x: x['total_points'], reverse=True)
-            for i, standing in enumerate(standings):
-                standing['position'] = i + 1
+            standings = self._format_league_standings(summary['standings'], league_id)
+            rows = standings.get("standings", [])
             
-            return {
+            return self._store_response(cache_key, {
                 "league_id": int(league_id),
-                "gameweek": int(selected_gameweek) if pd.notna(selected_gameweek) else "latest",
-                "total_players": len(standings),
-                "standings": standings,
-                "last_updated": datetime.now().isoformat()
-            }
+                "league_name": league_info.get('name'),
+                "last_updated": league_info.get('updated_at'),
+                "latest_gameweek": summary['latest_gameweek'],
+                "standings_gameweek": standings.get("gameweek"),
+                "total_players": len(rows),
+                "leader": rows[0] if rows else None,
+                "average_total_points": round(sum(row["total_points"] for row in rows) / len(rows), 1) if rows else 0,
+                "highest_gameweek_score": max((row["gameweek_points"] for row in rows), default=0),
+                "standings": rows
+            })
             
         except Exception as e:
-            print(f"Error getting normalized league standings: {e}")
-            import traceback
-            traceback.print_exc()
-            return {"error": str(e), "standings": []}
+            log.exception("Error getting league summary: %s", e)
+            return {"error": str(e)}
     
     def get_captain_analysis_from_db_normalized(self, league_id: int) -> Dict:
+        """Captain analysis response, served from the response cache until it expires or the league is re-ingested"""
+        cache_key = ('captain', league_id)
+        cached = self._cached_response(cache_key)
+        if cached is not None:
+            return cached
+        return self._store_response(cache_key, self._captain_analysis(league_id))
+    
+    def _captain_analysis(self, league_id: int) -> Dict:
         """Get captain analysis using database function - scalable approach"""
         try:
             df = fpl_db.get_captain_analysis_normalized(league_id)
@@ -360,75 +709,47 @@ class FPLService:
                 return {"analysis": [], "message": "No captain data found"}
             
             # Convert DataFrame to the expected format
-            captain_analysis = []
-            for _, row in df.iterrows():
-                captain_analysis.append({
-                    "player_id": int(row.get('captain_id', 0)),
-                    "player_name": str(row.get('captain_name', 'Unknown')),
-                    "times_captained": int(row.get('times_captained', 0)),
-                    "total_points": int(row.get('total_points', 0)),
-                    "average_points": float(row.get('average_points', 0.0)),
-                    "best_performance": int(row.get('best_performance', 0)),
-                    "worst_performance": int(row.get('worst_performance', 0))
-                })
+            frame = df.reindex(columns=CAPTAIN_FIELDS)
+            captain_analysis = [
+                {
+                    "player_id": int(captain_id),
+                    "player_name": str(captain_name),
+                    "times_captained": int(times_captained),
+                    "total_points": int(total_points),
+                    "average_points": float(average_points),
+                    "best_performance": int(best_performance),
+                    "worst_performance": int(worst_performance)
+                }
+                for captain_id, captain_name, times_captained, total_points, average_points,
+                    best_performance, worst_performance in zip(
+                    frame['captain_id'].fillna(0), frame['captain_name'].fillna('Unknown'),
+                    frame['times_captained'].fillna(0), frame['total_points'].fillna(0),
+                    frame['average_points'].fillna(0.0), frame['best_performance'].fillna(0),
+                    frame['worst_performance'].fillna(0)
+                )
+            ]
             
             # Get additional data for full analysis
             try:
-                # Get all gameweek data for manager information
-                response = fpl_db.client.table('gameweek_data_new')\
-                    .select('''
-                        entry_id,
-                        gameweek,
-                        points,
-                        total_points,
-                        captain_name,
-                        vice_captain_name,
-                        active_chip,
-                        transfers_cost,
-                        team_value,
-                        points_on_bench,
-                        global_players(player_name),
-                        league_memberships(team_name)
-                    ''')\
-                    .eq('league_id', league_id)\
-                    .execute()
-                
-                fpl_managers_data = []
-                if response.data:
-                    for record in response.data:
-                        # Handle nested data
-                        player_info = record.get('global_players', [])
-                        membership_info = record.get('league_memberships', [])
-                        
-                        player_name = player_info[0].get('player_name', 'Unknown') if player_info else 'Unknown'
-                        team_name = membership_info[0].get('team_name', 'Unknown') if membership_info else 'Unknown'
-                        
-                        fpl_managers_data.append({
-                            "fpl_manager": player_name,
-                            "team_name": team_name,
-                            "entry_id": record.get('entry_id'),
-                            "gameweek": record.get('gameweek', 0),
-                            "total_points": record.get('total_points', 0),
-                            "gameweek_points": record.get('points', 0),
-                            "captain": record.get('captain_name') or 'No Captain',
-                            "vice_captain": record.get('vice_captain_name') or 'No Vice Captain',
-                            "transfers_cost": record.get('transfers_cost', 0),
-                            "team_value": round(record.get('team_value', 0) / 10, 1) if record.get('team_value') else 0,
-                            "active_chip": record.get('active_chip'),
-                            "points_on_bench": record.get('points_on_bench', 0)
-                        })
-                
-                # Sort data
-                captain_analysis.sort(key=lambda x: x['total_points'], reverse=True)
-                fpl_managers_data.sort(key=lambda x: x['total_points'], reverse=True)
+                # Get all gameweek data for manager information - names come from the view's join.
+                # Both lists arrive ordered by total_points DESC from the database - no Python sort needed
+                managers = pd.DataFrame.from_records(fpl_db.get_league_manager_rows(league_id), columns=MANAGER_FIELDS)
+                for column, default in (('player_name', 'Unknown'), ('team_name', 'Unknown'),
+                                        ('captain_name', 'No Captain'), ('vice_captain_name', 'No Vice Captain'),
+                                        ('active_chip', None)):
+                    managers[column] = _with_default(managers[column], default)
+                managers[MANAGER_INT_FIELDS] = managers[MANAGER_INT_FIELDS].fillna(0).astype('int64')
+                managers['team_value'] = (managers['team_value'].astype(float).fillna(0) / 10).round(1)
+                managers = managers.rename(columns=MANAGER_RESPONSE_NAMES)[MANAGER_RESPONSE_FIELDS]
+                fpl_managers_data = managers.to_dict('records')
                 
                 # Get latest gameweek data
-                latest_gw = max((record['gameweek'] for record in fpl_managers_data), default=0)
-                latest_gw_data = [record for record in fpl_managers_data if record['gameweek'] == latest_gw]
-                latest_gw_data.sort(key=lambda x: x['gameweek_points'], reverse=True)
+                latest_gw = int(managers['gameweek'].max()) if not managers.empty else 0
+                latest_gw_data = managers[managers['gameweek'] == latest_gw]\
+                    .sort_values('gameweek_points', ascending=False, kind='stable').to_dict('records')
                 
             except Exception as manager_error:
-                print(f"Error getting manager data: {manager_error}")
+                log.error("Error getting manager data: %s", manager_error)
                 fpl_managers_data = []
                 latest_gw = 0
                 latest_gw_data = []
@@ -448,45 +769,62 @@ class FPLService:
             }
             
         except Exception as e:
-            print(f"Error getting normalized captain analysis: {e}")
-            import traceback  
-            print(f"Full traceback: {traceback.format_exc()}")
+            log.exception("Error getting normalized captain analysis: %s", e)
             return {"error": str(e), "analysis": []}
     
+    async def get_dashboard_bundle_async(self, league_id: int) -> Dict:
+        """
+        Standings and captain analysis in one round trip - dashboards ask for both, so the
+        captain query runs alongside the standings one and its frame lands in the result cache
+        for a follow-up /captain-analysis call
+        """
+        standings, captain_analysis = await asyncio.gather(
+            self.get_league_standings_from_db_normalized_async(league_id),
+            asyncio.to_thread(self.get_captain_analysis_from_db_normalized, league_id)
+        )
+        return {"league_id": int(league_id), "standings": standings, "captain_analysis": captain_analysis}
+    
     def get_player_cross_league_analysis(self, entry_id: int) -> Dict:
         """Get player's performance across all leagues"""
         try:
-            df = fpl_db.get_player_cross_league_stats(entry_id)
-            if df.empty:
-                return {"leagues": [], "message": "No data found for this player"}
-            
-            leagues_data = []
-            for league_id in df['league_id'].unique():
-                league_data = df[df['league_id'] == league_id]
-                league_info = league_data.iloc[0].get('leagues', {})
-                
-                if isinstance(league_info, list) and len(league_info) > 0:
-                    league_info = league_info[0]
-                
-                leagues_data.append({
-                    "league_id": league_id,
-                    "league_name": league_info.get('name', f'League {league_id}'),
-                    "total_gameweeks": len(league_data),
-                    "best_gameweek": league_data['points'].max(),
-                    "average_points": round(league_data['points'].mean(), 1),
-                    "total_points": league_data['total_points'].iloc[-1] if not league_data.empty else 0
-                })
-            
-            return {
-                "entry_id": entry_id,
-                "player_name": df.iloc[0].get('global_players', {}).get('player_name', 'Unknown'),
-                "total_leagues": len(leagues_data),
-                "leagues": leagues_data
-            }
-            
+            return self._format_cross_league_analysis(fpl_db.get_player_cross_league_stats(entry_id), entry_id)
         except Exception as e:
-            print(f"Error getting cross-league analysis: {e}")
+            log.exception("Error getting cross-league analysis: %s", e)
             return {"error": str(e), "leagues": []}
+    
+    async def get_player_cross_league_analysis_async(self, entry_id: int) -> Dict:
+        """Async variant of get_player_cross_league_analysis for FastAPI endpoints"""
+        try:
+            df = await fpl_db.get_player_cross_league_stats_async(entry_id)
+            return self._format_cross_league_analysis(df, entry_id)
+        except Exception as e:
+            log.exception("Error getting cross-league analysis: %s", e)
+            return {"error": str(e), "leagues": []}
+    
+    def _format_cross_league_analysis(self, df: pd.DataFrame, entry_id: int) -> Dict:
+        if df.empty:
+            return {"leagues": [], "message": "No data found for this player"}
+        
+        leagues_data = []
+        for league_id, league_data in df.groupby('league_id', sort=False):
+            league_name = league_data['league_name'].iloc[0]
+            
+            leagues_data.append({
+                "league_id": int(league_id),
+                "league_name": league_name if pd.notna(league_name) else f'League {league_id}',
+                "total_gameweeks": len(league_data),
+                "best_gameweek": int(league_data['points'].max()),
+                "average_points": round(float(league_data['points'].mean()), 1),
+                "total_points": int(league_data['total_points'].iloc[-1])
+            })
+        
+        player_name = df['player_name'].iloc[0]
+        return {
+            "entry_id": entry_id,
+            "player_name": player_name if pd.notna(player_name) else 'Unknown',
+            "total_leagues": len(leagues_data),
+            "leagues": leagues_data
+        }
 
 # Initialize FPL service
 fpl_service = FPLService()
\ No newline at end of file
@@ -1,13 +1,42 @@
 from fastapi import FastAPI, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, Dict, Any, List
 import uvicorn
 from datetime import datetime
+import asyncio
+import atexit
+import functools
+from contextlib import asynccontextmanager
+import logging
+import logging.handlers
+import orjson
 import os
+import queue
 from fpl_service import fpl_service
 from database import fpl_db
 
+PLAYER_HISTORY_FIELDS = ['gameweek', 'points', 'total_points', 'overall_rank', 'captain', 'vice_captain',
+                         'transfers_cost', 'team_value', 'active_chip']
+
+# LOG_LEVEL=DEBUG turns on per-row/per-batch diagnostics from the data layer.
+# Records go through a queue so the blocking stream write happens on the listener thread,
+# not in the request/ingest path.
+_log_handler = logging.StreamHandler()
+_log_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+_log_queue = queue.SimpleQueue()
+_log_listener = logging.handlers.QueueListener(_log_queue, _log_handler)
+# The listener's handler owns the format; the QueueHandler is attached directly because
+# basicConfig would give it its own formatter and every line would be formatted twice.
+logging.getLogger().addHandler(logging.handlers.QueueHandler(_log_queue))
+logging.getLogger().setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+_log_listener.start()
+atexit.register(_log_listener.stop)  # drain queued records on shutdown
+
+log = logging.getLogger(__name__)
+
 # Pydantic models for API responses
 class LeagueStandingsResponse(BaseModel):
     league_id: int
@@ -34,13 +63,40 @@ class ProcessDataRequest(BaseModel):
     league_id: int
     force_refresh: bool = False
 
+def handle_errors(message: str):
+    """Turn anything but an HTTPException raised by an endpoint into a 500 with message as the detail prefix"""
+    def decorator(endpoint):
+        @functools.wraps(endpoint)  # keeps the signature FastAPI reads parameters from
+        async def wrapper(*args, **kwargs):
+            try:
+                return await endpoint(*args, **kwargs)
+            except HTTPException:
+                raise
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"{message}: {str(e)}")
+        return wrapper
+    return decorator
+
 # Initialize FastAPI app
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Let queued fetches and gameweek writes finish, then release the service's pools and session
+    await asyncio.to_thread(fpl_service.close)
+    await fpl_db.close_pg_pool()
+
 app = FastAPI(
     title="FPL Mini-League API",
     description="API for Fantasy Premier League mini-league statistics and analysis",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    # Standings/summary payloads are large - orjson encodes them far faster than the stdlib encoder
+    default_response_class=ORJSONResponse
 )
 
+# Standings/summary JSON is repetitive and compresses well - smaller payloads for the mobile app
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 # Add CORS middleware for Flutter app
 app.add_middleware(
     CORSMiddleware,
@@ -58,287 +114,249 @@ async def root():
         "message": "FPL Mini-League API is running! 🏈",
         "version": "1.0.0",
         "timestamp": datetime.now().isoformat(),
-        "supabase_connected": fpl_db.test_connection()
+        "supabase_connected": await asyncio.to_thread(fpl_db.test_connection)
     }
 
 @app.get("/health")
+@handle_errors("Health check failed")
 async def health_check():
     """Detailed health check"""
-    try:
-        db_status = fpl_db.test_connection()
-        current_gw = fpl_db.get_current_gameweek()
-        
-        return {
-            "status": "healthy" if db_status else "unhealthy",
-            "database": "connected" if db_status else "disconnected",
-            "current_gameweek": current_gw,
-            "timestamp": datetime.now().isoformat()
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Health check failed: {str(e)}")
+    db_status, current_gw = await asyncio.gather(
+        asyncio.to_thread(fpl_db.test_connection),
+        asyncio.to_thread(fpl_db.get_current_gameweek)
+    )
+    
+    return {
+        "status": "healthy" if db_status else "unhealthy",
+        "database": "connected" if db_status else "disconnected",
+        "current_gameweek": current_gw,
+        "timestamp": datetime.now().isoformat()
+    }
 
 # Data collection endpoints
+# League ids with a /collect-data crawl queued or running (only touched from the event loop)
+_collecting = set()
+
 @app.post("/collect-data/{league_id}")
+@handle_errors("Failed to start data collection")
 async def collect_league_data(league_id: int, background_tasks: BackgroundTasks):
     """Collect fresh data from FPL API using normalized schema"""
-    try:
-        background_tasks.add_task(process_league_data_background_normalized, league_id)
-        
+    # One crawl per league at a time - a second press while one runs would just hit the FPL API twice
+    if league_id in _collecting:
         return {
-            "message": f"Data collection started for league {league_id}",
+            "message": f"Data collection already running for league {league_id}",
             "league_id": league_id,
-            "status": "processing",
-            "note": "Using normalized schema - no duplicate players across leagues"
+            "status": "already_processing"
         }
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to start data collection: {str(e)}")
+    _collecting.add(league_id)
+    background_tasks.add_task(process_league_data_background_normalized, league_id)
+    
+    return {
+        "message": f"Data collection started for league {league_id}",
+        "league_id": league_id,
+        "status": "processing",
+        "note": "Using normalized schema - no duplicate players across leagues"
+    }
 
 async def process_league_data_background_normalized(league_id: int):
     """Background task using normalized schema"""
     try:
-        print(f"Starting normalized data collection for league {league_id}")
-        df_gameweek, df_chips = fpl_service.process_league_data_normalized(league_id, store_in_db=True)
-        print(f"Normalized data collection completed for league {league_id}")
+        log.info("Starting normalized data collection for league %s", league_id)
+        df_gameweek, df_chips = await asyncio.to_thread(fpl_service.process_league_data_normalized, league_id, True)
+        log.info("Normalized data collection completed for league %s", league_id)
     except Exception as e:
-        print(f"Normalized data collection failed for league {league_id}: {e}")
+        log.exception("Normalized data collection failed for league %s: %s", league_id, e)
+    finally:
+        _collecting.discard(league_id)
 
 @app.post("/collect-data-sync/{league_id}")
+@handle_errors("Data collection failed")
 async def collect_league_data_sync(league_id: int):
     """Collect fresh data synchronously using normalized schema"""
-    try:
-        df_gameweek, df_chips = fpl_service.process_league_data_normalized(league_id, store_in_db=True)
-        
-        return {
-            "message": "Data collection completed successfully",
+    df_gameweek, df_chips = await asyncio.to_thread(fpl_service.process_league_data_normalized, league_id, True)
+    
+    return {
+        "message": "Data collection completed successfully",
+        "league_id": league_id,
+        "players_processed": len(df_gameweek),
+        "chips_processed": len(df_chips),
+        "schema": "normalized",
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.post("/collect-data-stream/{league_id}")
+async def collect_league_data_stream(league_id: int):
+    """Collect fresh data and stream one NDJSON progress line per processed batch of managers"""
+    async def progress():
+        players_processed = chips_processed = 0
+        async for gameweek_df, chips_df in fpl_service.iter_league_results(league_id, store_in_db=True):
+            players_processed += len(gameweek_df)
+            chips_processed += len(chips_df)
+            yield orjson.dumps({
+                "league_id": league_id,
+                "status": "processing",
+                "batch_players": len(gameweek_df),
+                "batch_chips": len(chips_df),
+                "players_processed": players_processed,
+                "chips_processed": chips_processed
+            }) + b"\n"
+        yield orjson.dumps({
             "league_id": league_id,
-            "players_processed": len(df_gameweek),
-            "chips_processed": len(df_chips),
-            "schema": "normalized",
+            "status": "complete",
+            "players_processed": players_processed,
+            "chips_processed": chips_processed,
             "timestamp": datetime.now().isoformat()
-        }
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Data collection failed: {str(e)}")
+        }) + b"\n"
+    
+    # identity keeps GZipMiddleware from buffering progress lines inside the compressor
+    return StreamingResponse(progress(), media_type="application/x-ndjson",
+                             headers={"Content-Encoding": "identity"})
 
 # League endpoints
+# These payloads are built from plain (or numpy) scalars, so they are handed to ORJSONResponse as-is -
+# skipping the jsonable_encoder pass FastAPI otherwise makes over every nested row before encoding
 @app.get("/league/{league_id}/standings")
-async def get_league_standings(league_id: int, gameweek: Optional[int] = None):
-    """Get league standings using normalized schema"""
-    try:
-        standings = fpl_service.get_league_standings_from_db_normalized(league_id, gameweek)
-        
-        if "error" in standings:
-            raise HTTPException(status_code=404, detail=standings["error"])
-        
-        return standings
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to get league standings: {str(e)}")
+@handle_errors("Failed to get league standings")
+async def get_league_standings(league_id: int, gameweek: Optional[int] = None,
+                               limit: Optional[int] = None, offset: int = 0):
+    """Get league standings using normalized schema (optionally paginated with limit/offset)"""
+    standings = await fpl_service.get_league_standings_from_db_normalized_async(league_id, gameweek, limit, offset)
+    
+    if "error" in standings:
+        raise HTTPException(status_code=404, detail=standings["error"])
+    
+    return ORJSONResponse(standings)
 
-@app.get("/league/{league_id}/summary", response_model=Dict[str, Any])
+@app.get("/league/{league_id}/summary")
+@handle_errors("Failed to get league summary")
 async def get_league_summary(league_id: int):
     """Get comprehensive league summary with all statistics"""
-    try:
-        summary = fpl_service.get_league_summary_from_db(league_id)
-        
-        if "error" in summary:
-            raise HTTPException(status_code=404, detail=summary["error"])
-        
-        return summary
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to get league summary: {str(e)}")
+    summary = await fpl_service.get_league_summary_from_db_async(league_id)
+    
+    if "error" in summary:
+        raise HTTPException(status_code=404, detail=summary["error"])
+    
+    return ORJSONResponse(summary)
 
 @app.get("/league/{league_id}/captain-analysis")
+@handle_errors("Failed to get captain analysis")
 async def get_captain_analysis(league_id: int):
     """Get captain analysis using normalized schema"""
-    try:
-        analysis = fpl_service.get_captain_analysis_from_db_normalized(league_id)
-        
-        if "error" in analysis:
-            raise HTTPException(status_code=404, detail=analysis["error"])
-        
-        return analysis
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to get captain analysis: {str(e)}")
+    analysis = await asyncio.to_thread(fpl_service.get_captain_analysis_from_db_normalized, league_id)
+    
+    if "error" in analysis:
+        raise HTTPException(status_code=404, detail=analysis["error"])
+    
+    return ORJSONResponse(analysis)
+
+@app.get("/league/{league_id}/dashboard")
+@handle_errors("Failed to get league dashboard")
+async def get_league_dashboard(league_id: int):
+    """Standings and captain analysis fetched concurrently in one response"""
+    return ORJSONResponse(await fpl_service.get_dashboard_bundle_async(league_id))
 
 # Player endpoints
-@app.get("/player/{entry_id}/trends", response_model=Dict[str, Any])
+@app.get("/player/{entry_id}/trends")
+@handle_errors("Failed to get player trends")
 async def get_player_trends(entry_id: int):
     """Get performance trends for a specific player over time"""
-    try:
-        trends = fpl_service.get_player_trends_from_db(entry_id)
-        
-        if "error" in trends:
-            raise HTTPException(status_code=404, detail=trends["error"])
-        
-        return trends
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to get player trends: {str(e)}")
+    trends = await asyncio.to_thread(fpl_service.get_player_trends_from_db, entry_id)
+    
+    if "error" in trends:
+        raise HTTPException(status_code=404, detail=trends["error"])
+    
+    return trends
 
 @app.get("/player/{entry_id}/history")
+@handle_errors("Failed to get player history")
 async def get_player_history(entry_id: int):
     """Get historical gameweek data for a specific player"""
-    try:
-        df = fpl_db.get_player_history(entry_id)
-        
-        if df.empty:
-            raise HTTPException(status_code=404, detail="No data found for this player")
-        
-        history = []
-        for _, row in df.iterrows():
-            history.append({
-                "gameweek": row.get('gameweek'),
-                "points": row.get('points'),
-                "total_points": row.get('total_points'),
-                "overall_rank": row.get('overall_rank'),
-                "captain": row.get('captain'),
-                "vice_captain": row.get('vice_captain'),
-                "transfers_cost": row.get('transfers_cost'),
-                "team_value": row.get('team_value', 0) / 10,  # Convert to millions
-                "active_chip": row.get('active_chip')
-            })
-        
-        return {
-            "entry_id": entry_id,
-            "total_gameweeks": len(history),
-            "history": history
-        }
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to get player history: {str(e)}")
+    df = await asyncio.to_thread(fpl_db.get_player_history, entry_id)
+    
+    if df.empty:
+        raise HTTPException(status_code=404, detail="No data found for this player")
+    
+    # One pass over the columns instead of a Series per row; absent columns come back as None
+    frame = df.reindex(columns=PLAYER_HISTORY_FIELDS)
+    frame['team_value'] = frame['team_value'].astype(float) / 10  # Convert to millions
+    frame = frame.astype(object)
+    history = frame.where(frame.notna(), None).to_dict('records')
+    
+    return {
+        "entry_id": entry_id,
+        "total_gameweeks": len(history),
+        "history": history
+    }
 
 # NEW ENDPOINT: Cross-league player analysis
 @app.get("/player/{entry_id}/cross-league-analysis")
+@handle_errors("Failed to get cross-league analysis")
 async def get_cross_league_analysis(entry_id: int):
     """Get player's performance across all leagues they participate in"""
-    try:
-        analysis = fpl_service.get_player_cross_league_analysis(entry_id)
-        
-        if "error" in analysis:
-            raise HTTPException(status_code=404, detail=analysis["error"])
-        
-        return analysis
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to get cross-league analysis: {str(e)}")
+    analysis = await fpl_service.get_player_cross_league_analysis_async(entry_id)
+    
+    if "error" in analysis:
+        raise HTTPException(status_code=404, detail=analysis["error"])
+    
+    return analysis
 
 # NEW ENDPOINT: Global player search
 @app.get("/players/search/{player_name}")
+@handle_errors("Player search failed")
 async def search_global_players(player_name: str):
     """Search for players across all leagues by name"""
-    try:
-        response = fpl_db.client.table('global_players')\
-            .select('entry_id, player_name, current_team_name')\
-            .ilike('player_name', f'%{player_name}%')\
-            .limit(20)\
-            .execute()
-        
-        if not response.data:
-            return {"players": [], "message": "No players found"}
-        
-        players = []
-        for player in response.data:
-            # Get leagues this player participates in
-            leagues_response = fpl_db.client.table('league_memberships')\
-                .select('league_id, leagues(name)')\
-                .eq('entry_id', player['entry_id'])\
-                .execute()
-            
-            player_leagues = []
-            if leagues_response.data:
-                for membership in leagues_response.data:
-                    league_info = membership.get('leagues', {})
-                    if isinstance(league_info, list) and len(league_info) > 0:
-                        league_info = league_info[0]
-                    
-                    player_leagues.append({
-                        "league_id": membership['league_id'],
-                        "league_name": league_info.get('name', f"League {membership['league_id']}")
-                    })
-            
-            players.append({
-                "entry_id": player['entry_id'],
-                "player_name": player['player_name'],
-                "current_team_name": player['current_team_name'],
-                "leagues": player_leagues,
-                "total_leagues": len(player_leagues)
-            })
-        
-        return {
-            "search_term": player_name,
-            "total_found": len(players),
-            "players": players
+    # supabase-py is synchronous - run the search in a worker thread so the event loop keeps serving
+    matches = await asyncio.to_thread(fpl_db.search_players, player_name)
+    
+    if not matches:
+        return {"players": [], "message": "No players found"}
+    
+    players = [
+        {
+            "entry_id": player['entry_id'],
+            "player_name": player['player_name'],
+            "current_team_name": player['current_team_name'],
+            "leagues": player['leagues'],
+            "total_leagues": len(player['leagues'])
         }
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Player search failed: {str(e)}")
+        for player in matches
+    ]
+    
+    return {
+        "search_term": player_name,
+        "total_found": len(players),
+        "players": players
+    }
 
 # NEW ENDPOINT: League statistics
 @app.get("/league/{league_id}/stats")
+@handle_errors("Failed to get league statistics")
 async def get_league_statistics(league_id: int):
     """Get comprehensive league statistics"""
-    try:
-        # Get basic league info
-        league_response = fpl_db.client.table('leagues')\
-            .select('*')\
-            .eq('id', league_id)\
-            .execute()
-        
-        if not league_response.data:
-            raise HTTPException(status_code=404, detail="League not found")
-        
-        # Get membership count and player diversity
-        memberships = fpl_db.client.table('league_memberships')\
-            .select('entry_id')\
-            .eq('league_id', league_id)\
-            .execute()
-        
-        # Get gameweek data for stats
-        gameweek_data = fpl_db.client.table('gameweek_data_new')\
-            .select('*')\
-            .eq('league_id', league_id)\
-            .execute()
-        
-        stats = {
-            "league_info": league_response.data[0],
-            "total_players": len(memberships.data) if memberships.data else 0,
-            "total_gameweeks": len(set(gw['gameweek'] for gw in gameweek_data.data)) if gameweek_data.data else 0,
-            "total_records": len(gameweek_data.data) if gameweek_data.data else 0
-        }
-        
-        if gameweek_data.data:
-            points = [gw['points'] for gw in gameweek_data.data if gw['points']]
-            if points:
-                stats.update({
-                    "highest_gameweek_score": max(points),
-                    "lowest_gameweek_score": min(points),
-                    "average_gameweek_score": round(sum(points) / len(points), 1),
-                    "total_transfers": sum(gw['transfers'] or 0 for gw in gameweek_data.data),
-                    "total_transfer_costs": sum(gw['transfers_cost'] or 0 for gw in gameweek_data.data)
-                })
-        
-        return stats
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to get league statistics: {str(e)}")
+    # League row and the aggregates are independent round trips - run them side by side.
+    # Counts and aggregates come back from one RPC instead of every gameweek row
+    league_info, league_stats = await asyncio.gather(
+        fpl_db.get_league_async(league_id),
+        fpl_db.get_league_stats_async(league_id)
+    )
+    
+    if not league_info:
+        raise HTTPException(status_code=404, detail="League not found")
+    
+    stats = {
+        "league_info": league_info,
+        "total_players": league_stats['total_players'],
+        "total_gameweeks": league_stats['total_gameweeks'],
+        "total_records": league_stats['total_records']
+    }
+    
+    if league_stats.get('highest_gameweek_score') is not None:
+        stats.update({key: league_stats[key] for key in (
+            'highest_gameweek_score', 'lowest_gameweek_score', 'average_gameweek_score',
+            'total_transfers', 'total_transfer_costs'
+        )})
+    
+    return stats
 
 # Utility endpoints
 @app.get("/gameweek/current")
@@ -346,7 +364,7 @@ async def get_current_gameweek():
     """Get current gameweek number"""
     try:
         # Try to get from FPL API first, fallback to database
-        current_gw = fpl_service.get_current_gameweek()
+        current_gw = await asyncio.to_thread(fpl_service.get_current_gameweek)
         
         return {
             "current_gameweek": current_gw,
@@ -357,7 +375,7 @@ async def get_current_gameweek():
     except Exception as e:
         # Fallback to database
         try:
-            current_gw = fpl_db.get_current_gameweek()
+            current_gw = await asyncio.to_thread(fpl_db.get_current_gameweek)
             return {
                 "current_gameweek": current_gw,
                 "source": "database",
@@ -407,10 +425,14 @@ async def internal_error_handler(request, exc):
 # Run the app
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8000))
-    print(f"🚀 Starting server on port {port}")
+    log.info("Starting server on port %s", port)
     uvicorn.run(
         "main:app",  # Use string format for Railway
         host="0.0.0.0",
         port=port,
+        # Requests mostly wait on Supabase/FPL I/O; each worker process gets its own clients and caches
+        workers=int(os.environ.get("WEB_CONCURRENCY", 2)),
+        loop="uvloop",  # both come with uvicorn[standard]
+        http="httptools",
         reload=False  # Disable reload in production
     )
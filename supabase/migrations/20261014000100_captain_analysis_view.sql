@@ -0,0 +1,16 @@
+-- Captain aggregation per league, computed in Postgres so the API only
+-- receives one row per captain instead of every gameweek record.
+CREATE OR REPLACE VIEW captain_analysis_view AS
+SELECT
+    league_id,
+    captain_id,
+    captain_name,
+    COUNT(*)                   AS times_captained,
+    SUM(points)                AS total_points,
+    ROUND(AVG(points)::numeric, 1) AS average_points,
+    MAX(points)                AS best_performance,
+    MIN(points)                AS worst_performance
+FROM gameweek_data_new
+WHERE captain_id IS NOT NULL
+  AND captain_name IS NOT NULL
+GROUP BY league_id, captain_id, captain_name;
@@ -0,0 +1,20 @@
+-- Pick the gameweek to show in standings with a single round trip:
+-- the current gameweek once it has points, otherwise the previous one
+-- if it has any data, otherwise the current gameweek.
+CREATE OR REPLACE FUNCTION smart_gameweek(p_league_id int, p_current_gw int)
+RETURNS int
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT CASE
+        WHEN EXISTS (
+            SELECT 1 FROM gameweek_data_new
+            WHERE league_id = p_league_id AND gameweek = p_current_gw AND points > 0
+        ) THEN p_current_gw
+        WHEN EXISTS (
+            SELECT 1 FROM gameweek_data_new
+            WHERE league_id = p_league_id AND gameweek = GREATEST(1, p_current_gw - 1)
+        ) THEN GREATEST(1, p_current_gw - 1)
+        ELSE p_current_gw
+    END
+$$;
@@ -0,0 +1,60 @@
+-- Column-oriented bulk load for fpl_footballers.
+-- payload is {"id": [...], "first_name": [...], ..., "updated_at": "<ts>"}: one
+-- array per column instead of one object per row, so keys are not repeated
+-- ~700 times in the request body.
+CREATE OR REPLACE FUNCTION _jsonb_column(payload jsonb, key text)
+RETURNS text[]
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT ARRAY(
+        SELECT value
+        FROM jsonb_array_elements_text(payload -> key) WITH ORDINALITY AS t(value, position)
+        ORDER BY position
+    )
+$$;
+
+CREATE OR REPLACE FUNCTION fpl_footballers_ingest(payload jsonb)
+RETURNS int
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    affected int;
+BEGIN
+    INSERT INTO fpl_footballers (
+        id, first_name, second_name, web_name, team_id, element_type,
+        now_cost, total_points, form, selected_by_percent, updated_at
+    )
+    SELECT
+        c.id, c.first_name, c.second_name, c.web_name, c.team_id, c.element_type,
+        c.now_cost, c.total_points, c.form, c.selected_by_percent,
+        (payload ->> 'updated_at')::timestamptz
+    FROM unnest(
+        _jsonb_column(payload, 'id')::int[],
+        _jsonb_column(payload, 'first_name'),
+        _jsonb_column(payload, 'second_name'),
+        _jsonb_column(payload, 'web_name'),
+        _jsonb_column(payload, 'team_id')::int[],
+        _jsonb_column(payload, 'element_type')::int[],
+        _jsonb_column(payload, 'now_cost')::int[],
+        _jsonb_column(payload, 'total_points')::int[],
+        _jsonb_column(payload, 'form')::numeric[],
+        _jsonb_column(payload, 'selected_by_percent')::numeric[]
+    ) AS c(id, first_name, second_name, web_name, team_id, element_type,
+           now_cost, total_points, form, selected_by_percent)
+    ON CONFLICT (id) DO UPDATE SET
+        first_name = EXCLUDED.first_name,
+        second_name = EXCLUDED.second_name,
+        web_name = EXCLUDED.web_name,
+        team_id = EXCLUDED.team_id,
+        element_type = EXCLUDED.element_type,
+        now_cost = EXCLUDED.now_cost,
+        total_points = EXCLUDED.total_points,
+        form = EXCLUDED.form,
+        selected_by_percent = EXCLUDED.selected_by_percent,
+        updated_at = EXCLUDED.updated_at;
+
+    GET DIAGNOSTICS affected = ROW_COUNT;
+    RETURN affected;
+END
+$$;
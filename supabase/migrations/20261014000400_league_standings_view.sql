@@ -0,0 +1,30 @@
+-- Standings per league and gameweek with the rank computed in Postgres, so
+-- the API neither re-sorts rows nor numbers positions itself.
+-- league_id and gameweek are the window partition keys, which lets the
+-- planner push the API's eq() filters below the window function.
+DROP VIEW IF EXISTS league_standings_view;
+
+CREATE VIEW league_standings_view AS
+SELECT
+    g.league_id,
+    g.gameweek,
+    g.entry_id,
+    gp.player_name,
+    lm.team_name,
+    g.total_points,
+    g.points AS gameweek_points,
+    g.transfers,
+    g.transfers_cost,
+    g.captain_name,
+    g.vice_captain_name,
+    g.active_chip,
+    g.points_on_bench,
+    ROW_NUMBER() OVER (
+        PARTITION BY g.league_id, g.gameweek
+        ORDER BY g.total_points DESC
+    ) AS league_position
+FROM gameweek_data_new g
+LEFT JOIN global_players gp
+    ON gp.entry_id = g.entry_id
+LEFT JOIN league_memberships lm
+    ON lm.league_id = g.league_id AND lm.entry_id = g.entry_id;
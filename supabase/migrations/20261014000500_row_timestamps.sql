@@ -0,0 +1,40 @@
+-- Let Postgres stamp the "last touched" columns instead of the API sending an
+-- ISO string on every row. DEFAULT now() covers inserts; the BEFORE trigger
+-- covers the ON CONFLICT DO UPDATE half of every upsert.
+CREATE OR REPLACE FUNCTION touch_row_timestamp()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    -- TG_ARGV[0] names the column, since the tables do not agree on one
+    NEW := jsonb_populate_record(NEW, jsonb_build_object(TG_ARGV[0], now()));
+    RETURN NEW;
+END
+$$;
+
+ALTER TABLE leagues ALTER COLUMN updated_at SET DEFAULT now();
+ALTER TABLE global_players ALTER COLUMN last_updated SET DEFAULT now();
+ALTER TABLE league_memberships ALTER COLUMN last_active SET DEFAULT now();
+ALTER TABLE fpl_footballers ALTER COLUMN updated_at SET DEFAULT now();
+ALTER TABLE gameweek_data_new ALTER COLUMN updated_at SET DEFAULT now();
+
+DROP TRIGGER IF EXISTS leagues_touch ON leagues;
+CREATE TRIGGER leagues_touch BEFORE INSERT OR UPDATE ON leagues
+    FOR EACH ROW EXECUTE FUNCTION touch_row_timestamp('updated_at');
+
+DROP TRIGGER IF EXISTS global_players_touch ON global_players;
+CREATE TRIGGER global_players_touch BEFORE INSERT OR UPDATE ON global_players
+    FOR EACH ROW EXECUTE FUNCTION touch_row_timestamp('last_updated');
+
+DROP TRIGGER IF EXISTS league_memberships_touch ON league_memberships;
+CREATE TRIGGER league_memberships_touch BEFORE INSERT OR UPDATE ON league_memberships
+    FOR EACH ROW EXECUTE FUNCTION touch_row_timestamp('last_active');
+
+-- Also stamps rows written by fpl_footballers_ingest, which now receives no updated_at
+DROP TRIGGER IF EXISTS fpl_footballers_touch ON fpl_footballers;
+CREATE TRIGGER fpl_footballers_touch BEFORE INSERT OR UPDATE ON fpl_footballers
+    FOR EACH ROW EXECUTE FUNCTION touch_row_timestamp('updated_at');
+
+DROP TRIGGER IF EXISTS gameweek_data_new_touch ON gameweek_data_new;
+CREATE TRIGGER gameweek_data_new_touch BEFORE INSERT OR UPDATE ON gameweek_data_new
+    FOR EACH ROW EXECUTE FUNCTION touch_row_timestamp('updated_at');
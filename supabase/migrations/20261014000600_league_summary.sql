@@ -0,0 +1,25 @@
+-- Everything /league/{id}/summary needs in one round trip: the league row,
+-- the standings for the smart-selected gameweek (already ranked by
+-- league_standings_view) and the latest gameweek stored for the league.
+CREATE OR REPLACE FUNCTION league_summary(p_league_id int, p_current_gw int)
+RETURNS jsonb
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT jsonb_build_object(
+        'league_info', (
+            SELECT to_jsonb(l)
+            FROM (SELECT id, name, updated_at FROM leagues WHERE id = p_league_id) l
+        ),
+        'selected_gameweek', sg.gameweek,
+        'standings', COALESCE((
+            SELECT jsonb_agg(to_jsonb(s) - 'league_id' - 'gameweek' ORDER BY s.league_position)
+            FROM league_standings_view s
+            WHERE s.league_id = p_league_id AND s.gameweek = sg.gameweek
+        ), '[]'::jsonb),
+        'latest_gameweek', (
+            SELECT max(gameweek) FROM gameweek_data_new WHERE league_id = p_league_id
+        )
+    )
+    FROM (SELECT smart_gameweek(p_league_id, p_current_gw) AS gameweek) sg
+$$;
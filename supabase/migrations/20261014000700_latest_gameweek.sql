@@ -0,0 +1,12 @@
+-- Latest stored gameweek for a league. With the index below max() is a
+-- single index probe, as is league_summary's latest_gameweek field.
+CREATE INDEX IF NOT EXISTS idx_gameweek_data_new_league_gameweek
+    ON gameweek_data_new (league_id, gameweek DESC);
+
+CREATE OR REPLACE FUNCTION latest_gameweek(p_league_id int)
+RETURNS int
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT max(gameweek) FROM gameweek_data_new WHERE league_id = p_league_id
+$$;
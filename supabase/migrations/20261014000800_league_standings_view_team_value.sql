@@ -0,0 +1,28 @@
+-- Expose team_value so per-manager gameweek reads can use this flat join
+-- instead of embedding global_players / league_memberships per row.
+-- New columns must go last for CREATE OR REPLACE VIEW.
+CREATE OR REPLACE VIEW league_standings_view AS
+SELECT
+    g.league_id,
+    g.gameweek,
+    g.entry_id,
+    gp.player_name,
+    lm.team_name,
+    g.total_points,
+    g.points AS gameweek_points,
+    g.transfers,
+    g.transfers_cost,
+    g.captain_name,
+    g.vice_captain_name,
+    g.active_chip,
+    g.points_on_bench,
+    ROW_NUMBER() OVER (
+        PARTITION BY g.league_id, g.gameweek
+        ORDER BY g.total_points DESC
+    ) AS league_position,
+    g.team_value
+FROM gameweek_data_new g
+LEFT JOIN global_players gp
+    ON gp.entry_id = g.entry_id
+LEFT JOIN league_memberships lm
+    ON lm.league_id = g.league_id AND lm.entry_id = g.entry_id;
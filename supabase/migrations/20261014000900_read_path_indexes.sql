@@ -0,0 +1,22 @@
+-- Composite indexes matching the API's eq(...)/order(...) read paths, so
+-- Postgres can scan in index order instead of sorting after the filter.
+-- Plain (non-CONCURRENTLY) builds: migrations run inside a transaction.
+-- (league_id, gameweek DESC) on gameweek_data_new is created by the
+-- latest_gameweek migration.
+
+-- Standings for one league + gameweek, ranked by total_points
+-- (league_standings_view window and the fallback's order('total_points'))
+CREATE INDEX IF NOT EXISTS idx_gameweek_data_new_league_gw_points
+    ON gameweek_data_new (league_id, gameweek, total_points DESC);
+
+-- Player history and cross-league stats: in_('entry_id', ...) ordered by gameweek
+CREATE INDEX IF NOT EXISTS idx_gameweek_data_new_entry_gameweek
+    ON gameweek_data_new (entry_id, gameweek);
+
+-- Cross-league membership lookup by entry_id; (league_id, entry_id) is the unique key
+CREATE INDEX IF NOT EXISTS idx_league_memberships_entry
+    ON league_memberships (entry_id);
+
+-- Chip usage per league by gameweek
+CREATE INDEX IF NOT EXISTS idx_chip_usage_new_league_gameweek_used
+    ON chip_usage_new (league_id, gameweek_used);
@@ -0,0 +1,47 @@
+-- Store a collected gameweek and its chip usage in one transaction and one
+-- round trip. p_data / p_chips are the same record arrays the API would
+-- otherwise upsert into gameweek_data_new and chip_usage_new separately.
+-- updated_at is stamped by the gameweek_data_new_touch trigger.
+CREATE OR REPLACE FUNCTION ingest_gameweek(p_data jsonb, p_chips jsonb)
+RETURNS int
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    affected int;
+BEGIN
+    INSERT INTO gameweek_data_new (
+        league_id, entry_id, gameweek, points, total_points, points_net, bank,
+        team_value, transfers, transfers_cost, points_on_bench, captain_id,
+        captain_name, vice_captain_id, vice_captain_name, active_chip
+    )
+    SELECT
+        league_id, entry_id, gameweek, points, total_points, points_net, bank,
+        team_value, transfers, transfers_cost, points_on_bench, captain_id,
+        captain_name, vice_captain_id, vice_captain_name, active_chip
+    FROM jsonb_populate_recordset(NULL::gameweek_data_new, p_data)
+    ON CONFLICT (league_id, entry_id, gameweek) DO UPDATE SET
+        points = EXCLUDED.points,
+        total_points = EXCLUDED.total_points,
+        points_net = EXCLUDED.points_net,
+        bank = EXCLUDED.bank,
+        team_value = EXCLUDED.team_value,
+        transfers = EXCLUDED.transfers,
+        transfers_cost = EXCLUDED.transfers_cost,
+        points_on_bench = EXCLUDED.points_on_bench,
+        captain_id = EXCLUDED.captain_id,
+        captain_name = EXCLUDED.captain_name,
+        vice_captain_id = EXCLUDED.vice_captain_id,
+        vice_captain_name = EXCLUDED.vice_captain_name,
+        active_chip = EXCLUDED.active_chip;
+
+    GET DIAGNOSTICS affected = ROW_COUNT;
+
+    INSERT INTO chip_usage_new (league_id, entry_id, chip_name, gameweek_used)
+    SELECT league_id, entry_id, chip_name, gameweek_used
+    FROM jsonb_populate_recordset(NULL::chip_usage_new, COALESCE(p_chips, '[]'::jsonb))
+    ON CONFLICT (league_id, entry_id, chip_name) DO UPDATE SET
+        gameweek_used = EXCLUDED.gameweek_used;
+
+    RETURN affected;
+END
+$$;
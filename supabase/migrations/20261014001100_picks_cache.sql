@@ -0,0 +1,14 @@
+-- Captain / vice-captain / chip picks per manager and gameweek, as fetched
+-- from the FPL picks endpoint. Picks are locked at the gameweek deadline, so
+-- once a gameweek is current or finished the cached row never goes stale and
+-- re-ingests skip the API call. Only the fields the ingest reads are kept
+-- (element/is_captain/is_vice_captain per pick and active_chip), not the
+-- live entry_history block.
+
+CREATE TABLE IF NOT EXISTS picks_cache (
+    entry_id   bigint      NOT NULL,
+    gameweek   integer     NOT NULL,
+    payload    jsonb       NOT NULL,
+    fetched_at timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (entry_id, gameweek)
+);
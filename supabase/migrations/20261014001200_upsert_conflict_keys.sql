@@ -0,0 +1,36 @@
+-- Every write path (PostgREST upserts, the COPY merge and the ingest RPCs)
+-- is an INSERT ... ON CONFLICT on these natural keys, which is what makes a
+-- re-run after a crash or a concurrent ingest of the same league safe. Make
+-- sure the unique keys exist; tables that already have a unique index on
+-- the same columns (in any order) are left alone so no duplicate index is
+-- added.
+
+DO $$
+DECLARE
+    target record;
+BEGIN
+    FOR target IN
+        SELECT * FROM (VALUES
+            ('gameweek_data_new',  ARRAY['league_id', 'entry_id', 'gameweek']),
+            ('chip_usage_new',     ARRAY['league_id', 'entry_id', 'chip_name']),
+            ('league_memberships', ARRAY['league_id', 'entry_id'])
+        ) AS t(table_name, key_columns)
+    LOOP
+        IF NOT EXISTS (
+            SELECT 1
+            FROM pg_index i
+            WHERE i.indrelid = target.table_name::regclass
+              AND i.indisunique
+              AND i.indnkeyatts = cardinality(target.key_columns)
+              AND (SELECT array_agg(a.attname::text ORDER BY a.attname)
+                   FROM pg_attribute a
+                   WHERE a.attrelid = i.indrelid AND a.attnum = ANY (i.indkey))
+                  = (SELECT array_agg(c ORDER BY c) FROM unnest(target.key_columns) AS c)
+        ) THEN
+            EXECUTE format('ALTER TABLE %I ADD CONSTRAINT %I UNIQUE (%s)',
+                           target.table_name,
+                           target.table_name || '_' || array_to_string(target.key_columns, '_') || '_key',
+                           array_to_string(target.key_columns, ', '));
+        END IF;
+    END LOOP;
+END $$;
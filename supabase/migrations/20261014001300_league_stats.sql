@@ -0,0 +1,23 @@
+-- Aggregates behind /league/{id}/stats, computed next to the data so the
+-- endpoint gets one row back instead of every gameweek row of the league.
+-- Score stats skip null/zero points, matching the previous Python filter.
+CREATE OR REPLACE FUNCTION league_stats(p_league_id int)
+RETURNS jsonb
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT jsonb_build_object(
+        'total_players', (
+            SELECT count(*) FROM league_memberships WHERE league_id = p_league_id
+        ),
+        'total_gameweeks', count(DISTINCT g.gameweek),
+        'total_records', count(*),
+        'highest_gameweek_score', max(g.points) FILTER (WHERE g.points <> 0),
+        'lowest_gameweek_score', min(g.points) FILTER (WHERE g.points <> 0),
+        'average_gameweek_score', round(avg(g.points) FILTER (WHERE g.points <> 0), 1),
+        'total_transfers', COALESCE(sum(g.transfers), 0),
+        'total_transfer_costs', COALESCE(sum(g.transfers_cost), 0)
+    )
+    FROM gameweek_data_new g
+    WHERE g.league_id = p_league_id
+$$;
@@ -0,0 +1,8 @@
+-- /players/search/{name} filters with ilike '%name%', which a btree index
+-- cannot serve. A trigram GIN index lets Postgres answer the substring
+-- match from the index instead of scanning every global_players row
+-- (used for patterns of 3+ characters).
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_global_players_player_name_trgm
+    ON global_players USING gin (player_name gin_trgm_ops);
@@ -0,0 +1,44 @@
+-- Player search as one precomputed row per player: name, team and the
+-- leagues they are in, so /players/search/{name} is a single ilike on one
+-- relation instead of a membership/league lookup per query.
+-- Refreshed by refresh_player_search() after each league collection.
+CREATE MATERIALIZED VIEW IF NOT EXISTS player_search_mv AS
+SELECT
+    gp.entry_id,
+    gp.player_name,
+    gp.current_team_name,
+    COALESCE(
+        jsonb_agg(
+            jsonb_build_object(
+                'league_id', lm.league_id,
+                'league_name', COALESCE(l.name, 'League ' || lm.league_id)
+            ) ORDER BY lm.league_id
+        ) FILTER (WHERE lm.league_id IS NOT NULL),
+        '[]'::jsonb
+    ) AS leagues
+FROM global_players gp
+LEFT JOIN league_memberships lm ON lm.entry_id = gp.entry_id
+LEFT JOIN leagues l ON l.id = lm.league_id
+GROUP BY gp.entry_id, gp.player_name, gp.current_team_name;
+
+-- Required by REFRESH ... CONCURRENTLY, which keeps the view readable while it rebuilds
+CREATE UNIQUE INDEX IF NOT EXISTS idx_player_search_mv_entry
+    ON player_search_mv (entry_id);
+
+CREATE INDEX IF NOT EXISTS idx_player_search_mv_player_name_trgm
+    ON player_search_mv USING gin (player_name gin_trgm_ops);
+
+CREATE OR REPLACE FUNCTION refresh_player_search()
+RETURNS void
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    REFRESH MATERIALIZED VIEW CONCURRENTLY player_search_mv;
+END;
+$$;
+
+-- A full rebuild is expensive, so only the service role (the ingest) may trigger one
+REVOKE EXECUTE ON FUNCTION refresh_player_search() FROM public, anon, authenticated;
+GRANT EXECUTE ON FUNCTION refresh_player_search() TO service_role;
@@ -0,0 +1,84 @@
+-- FPL history lists a chip once per use: wildcard twice a season, and every
+-- chip twice from 2024/25. With (league_id, entry_id, chip_name) as the key a
+-- batch holding both uses hit "ON CONFLICT DO UPDATE command cannot affect
+-- row a second time" and rolled back the whole ingest_gameweek call. Key chip
+-- rows by the gameweek they were played in as well, so each use is its own row.
+
+DO $$
+DECLARE
+    old_key record;
+BEGIN
+    -- Drop the old three-column unique key, whether it is a constraint or a bare unique index
+    FOR old_key IN
+        SELECT i.indexrelid::regclass AS index_name, con.conname
+        FROM pg_index i
+        LEFT JOIN pg_constraint con ON con.conindid = i.indexrelid AND con.conrelid = i.indrelid
+        WHERE i.indrelid = 'chip_usage_new'::regclass
+          AND i.indisunique
+          AND i.indnkeyatts = 3
+          AND (SELECT array_agg(a.attname::text ORDER BY a.attname)
+               FROM pg_attribute a
+               WHERE a.attrelid = i.indrelid AND a.attnum = ANY (i.indkey))
+              = ARRAY['chip_name', 'entry_id', 'league_id']
+    LOOP
+        IF old_key.conname IS NOT NULL THEN
+            EXECUTE format('ALTER TABLE chip_usage_new DROP CONSTRAINT %I', old_key.conname);
+        ELSE
+            EXECUTE format('DROP INDEX %s', old_key.index_name);
+        END IF;
+    END LOOP;
+
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conrelid = 'chip_usage_new'::regclass
+          AND conname = 'chip_usage_new_league_id_entry_id_chip_name_gameweek_used_key'
+    ) THEN
+        ALTER TABLE chip_usage_new ADD CONSTRAINT chip_usage_new_league_id_entry_id_chip_name_gameweek_used_key
+            UNIQUE (league_id, entry_id, chip_name, gameweek_used);
+    END IF;
+END $$;
+
+-- Same function as before, with chip rows deduplicated and upserted on the new key
+CREATE OR REPLACE FUNCTION ingest_gameweek(p_data jsonb, p_chips jsonb)
+RETURNS int
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    affected int;
+BEGIN
+    INSERT INTO gameweek_data_new (
+        league_id, entry_id, gameweek, points, total_points, points_net, bank,
+        team_value, transfers, transfers_cost, points_on_bench, captain_id,
+        captain_name, vice_captain_id, vice_captain_name, active_chip
+    )
+    SELECT
+        league_id, entry_id, gameweek, points, total_points, points_net, bank,
+        team_value, transfers, transfers_cost, points_on_bench, captain_id,
+        captain_name, vice_captain_id, vice_captain_name, active_chip
+    FROM jsonb_populate_recordset(NULL::gameweek_data_new, p_data)
+    ON CONFLICT (league_id, entry_id, gameweek) DO UPDATE SET
+        points = EXCLUDED.points,
+        total_points = EXCLUDED.total_points,
+        points_net = EXCLUDED.points_net,
+        bank = EXCLUDED.bank,
+        team_value = EXCLUDED.team_value,
+        transfers = EXCLUDED.transfers,
+        transfers_cost = EXCLUDED.transfers_cost,
+        points_on_bench = EXCLUDED.points_on_bench,
+        captain_id = EXCLUDED.captain_id,
+        captain_name = EXCLUDED.captain_name,
+        vice_captain_id = EXCLUDED.vice_captain_id,
+        vice_captain_name = EXCLUDED.vice_captain_name,
+        active_chip = EXCLUDED.active_chip;
+
+    GET DIAGNOSTICS affected = ROW_COUNT;
+
+    -- A chip use is fully described by its key, so an existing row needs no update
+    INSERT INTO chip_usage_new (league_id, entry_id, chip_name, gameweek_used)
+    SELECT DISTINCT league_id, entry_id, chip_name, gameweek_used
+    FROM jsonb_populate_recordset(NULL::chip_usage_new, COALESCE(p_chips, '[]'::jsonb))
+    ON CONFLICT (league_id, entry_id, chip_name, gameweek_used) DO NOTHING;
+
+    RETURN affected;
+END
+$$;
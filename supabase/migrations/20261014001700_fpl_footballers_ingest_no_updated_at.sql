@@ -0,0 +1,46 @@
+-- fpl_footballers_ingest no longer reads "updated_at" from the payload: the API
+-- stopped sending it, so the column was being written as NULL and only fixed up
+-- by fpl_footballers_touch. Leave it to the column default and that trigger.
+-- payload is {"id": [...], "first_name": [...], ...}: one array per column.
+CREATE OR REPLACE FUNCTION fpl_footballers_ingest(payload jsonb)
+RETURNS int
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    affected int;
+BEGIN
+    INSERT INTO fpl_footballers (
+        id, first_name, second_name, web_name, team_id, element_type,
+        now_cost, total_points, form, selected_by_percent
+    )
+    SELECT
+        c.id, c.first_name, c.second_name, c.web_name, c.team_id, c.element_type,
+        c.now_cost, c.total_points, c.form, c.selected_by_percent
+    FROM unnest(
+        _jsonb_column(payload, 'id')::int[],
+        _jsonb_column(payload, 'first_name'),
+        _jsonb_column(payload, 'second_name'),
+        _jsonb_column(payload, 'web_name'),
+        _jsonb_column(payload, 'team_id')::int[],
+        _jsonb_column(payload, 'element_type')::int[],
+        _jsonb_column(payload, 'now_cost')::int[],
+        _jsonb_column(payload, 'total_points')::int[],
+        _jsonb_column(payload, 'form')::numeric[],
+        _jsonb_column(payload, 'selected_by_percent')::numeric[]
+    ) AS c(id, first_name, second_name, web_name, team_id, element_type,
+           now_cost, total_points, form, selected_by_percent)
+    ON CONFLICT (id) DO UPDATE SET
+        first_name = EXCLUDED.first_name,
+        second_name = EXCLUDED.second_name,
+        web_name = EXCLUDED.web_name,
+        team_id = EXCLUDED.team_id,
+        element_type = EXCLUDED.element_type,
+        now_cost = EXCLUDED.now_cost,
+        total_points = EXCLUDED.total_points,
+        form = EXCLUDED.form,
+        selected_by_percent = EXCLUDED.selected_by_percent;
+
+    GET DIAGNOSTICS affected = ROW_COUNT;
+    RETURN affected;
+END
+$$;
@@ -0,0 +1,28 @@
+import importlib
+import unittest
+
+
+class ImportSmokeTest(unittest.TestCase):
+    """Module-level setup (logging, httpx/orjson patching) runs on import, so a broken
+    patch should fail here rather than at app startup."""
+
+    def test_modules_import(self):
+        for name in ('database', 'fpl_service', 'main'):
+            with self.subTest(module=name):
+                importlib.import_module(name)
+
+    def test_httpx_json_goes_through_orjson(self):
+        importlib.import_module('database')
+        import httpx._content as httpx_content
+        import httpx._models as httpx_models
+
+        payload = {'id': 1, 'name': 'Salah'}
+        if hasattr(httpx_models, 'jsonlib'):
+            self.assertEqual(httpx_models.jsonlib.loads(b'{"id":1,"name":"Salah"}'), payload)
+            self.assertEqual(httpx_models.jsonlib.loads(httpx_models.jsonlib.dumps(payload)), payload)
+        if hasattr(httpx_content, 'json_dumps'):
+            self.assertEqual(httpx_content.json_dumps(payload, ensure_ascii=False), '{"id":1,"name":"Salah"}')
+
+
+if __name__ == '__main__':
+    unittest.main()